@@ -1,22 +1,73 @@
 """
 Autonomous Tracking Robot Car - Flask Server with WebSocket Control
 """
-from flask import Flask, render_template, Response, jsonify, send_file
+# eventlet must patch the standard library before anything else is imported
+try:
+    import eventlet
+    eventlet.monkey_patch()
+    from eventlet import tpool
+    ASYNC_MODE = 'eventlet'
+except ImportError:
+    tpool = None
+    ASYNC_MODE = 'threading'
+
+from flask import Flask, render_template, jsonify, send_file, request, Response
 from flask_socketio import SocketIO, emit
 import cv2
+import json
+import numpy as np
 import time
 from datetime import datetime
 from io import BytesIO
 import config
-from detector import HumanDetector
+from detector import HumanDetector, export_ncnn_model, export_onnx_model, export_openvino_model
 from motors import MotorController
 from arduino_serial import ArduinoSerial
 from tracking import PersonTracker
 from sensor_logger import SensorLogger
 
+# JSON bodies as bytes; NumPy arrays/scalars (e.g. sensor history) serialize directly
+try:
+    import orjson
+    
+    def json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    def _json_default(obj):
+        if isinstance(obj, (np.ndarray, np.generic)):
+            return obj.tolist()
+        raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+    
+    def json_dumps(obj):
+        return json.dumps(obj, default=_json_default).encode('utf-8')
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'batman-secret-key-290'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# JPEG frames are already compressed - don't spend CPU compressing them again
+# (http_compression only covers long-polling responses, see below for the websocket)
+socketio = SocketIO(app, async_mode=ASYNC_MODE, cors_allowed_origins="*", http_compression=False)
+
+
+def no_websocket_deflate(wsgi_app):
+    """
+    Wrap a WSGI app so websocket handshakes never negotiate permessage-deflate
+    Browsers always offer it and the websocket servers (eventlet, simple-websocket)
+    accept it, after which every frame event is deflated - there's no per-emit
+    switch in Flask-SocketIO, so the offer is dropped before the handshake sees it
+    
+    Args:
+        wsgi_app: WSGI application (outermost, so it runs before Socket.IO's)
+    
+    Returns:
+        callable: Wrapped WSGI application
+    """
+    def run(environ, start_response):
+        environ.pop('HTTP_SEC_WEBSOCKET_EXTENSIONS', None)
+        return wsgi_app(environ, start_response)
+    return run
+
+
+app.wsgi_app = no_websocket_deflate(app.wsgi_app)
 
 # Global objects
 detector = None
@@ -24,73 +75,278 @@ motors = None
 arduino = None
 tracker = None
 sensor_logger = None
+broadcaster = None
 control_mode = config.DEFAULT_MODE  # 'manual' or 'auto'
 current_fps = 0  # Track current FPS
+client_rtts = {}  # Round-trip time (ms) reported by each connected client
+
+# Serialized JSON responses reused for STATUS_CACHE_TTL seconds
+_status_cache = {'expires': 0.0, 'body': b''}
+_sensor_cache = {'expires': 0.0, 'body': b''}
+
+
+def blocking_call(func, *args, **kwargs):
+    """
+    Run a blocking C call (camera read, inference, JPEG encode) in eventlet's
+    native thread pool so it doesn't stall the WebSocket event loop
+    """
+    if tpool is not None:
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
 
 
 def initialize_system():
     """Initialize all systems"""
-    global detector, motors, arduino, tracker, sensor_logger
+    global detector, motors, arduino, tracker, sensor_logger, broadcaster
     
     print("Initializing autonomous tracking robot...")
     
+    # Use the NCNN, ONNX or OpenVINO model when available (exported once on first run)
+    model_name = config.YOLO_MODEL
+    device = 'cpu'
+    if config.USE_NCNN:
+        try:
+            model_name = export_ncnn_model(config.YOLO_MODEL)
+        except Exception as e:
+            print(f"⚠️  NCNN export failed: {e}, using PyTorch model")
+            model_name = config.YOLO_MODEL
+    elif config.USE_ONNXRUNTIME:
+        try:
+            model_name = export_onnx_model(config.YOLO_MODEL)
+        except Exception as e:
+            print(f"⚠️  ONNX export failed: {e}, using PyTorch model")
+            model_name = config.YOLO_MODEL
+    elif config.USE_OPENVINO:
+        try:
+            model_name = export_openvino_model(config.YOLO_MODEL, int8=config.YOLO_INT8)
+            device = config.OPENVINO_DEVICE
+        except Exception as e:
+            print(f"⚠️  OpenVINO export failed: {e}, using PyTorch model")
+            model_name = config.YOLO_MODEL
+    
     # Initialize human detector
     detector = HumanDetector(
-        model_name=config.YOLO_MODEL,
+        model_name=model_name,
         conf_threshold=config.CONFIDENCE_THRESHOLD,
         camera_index=config.CAMERA_INDEX,
-        resolution=(config.CAMERA_WIDTH, config.CAMERA_HEIGHT)
+        resolution=(config.CAMERA_WIDTH, config.CAMERA_HEIGHT),
+        device=device,
+        blocking_call=blocking_call
     )
+    detector.warmup()
     
     # Initialize motor controller
     motors = MotorController(
         ena=config.ENA, in1=config.IN1, in2=config.IN2,
-        enb=config.ENB, in3=config.IN3, in4=config.IN4
+        enb=config.ENB, in3=config.IN3, in4=config.IN4,
+        hw_pwm_channels=config.MOTOR_HW_PWM_CHANNELS, hw_pwm_chip=config.MOTOR_HW_PWM_CHIP,
+        command_hz=config.MOTOR_COMMAND_HZ,
+        writer_cpus=config.MOTOR_CPUS, writer_priority=config.MOTOR_RT_PRIORITY
     )
     
     # Initialize Arduino serial
     arduino = ArduinoSerial(
         port=config.ARDUINO_PORT,
         baudrate=config.ARDUINO_BAUD,
-        debug=config.ARDUINO_DEBUG
+        debug=config.ARDUINO_DEBUG,
+        binary=config.ARDUINO_BINARY
     )
     arduino.start()
     
     # Initialize sensor logger
-    sensor_logger = SensorLogger(max_entries=2000)  # Keep last 2000 readings
+    sensor_logger = SensorLogger(max_entries=config.SENSOR_LOG_ENTRIES, path=config.SENSOR_LOG_FILE)
     
     # Initialize person tracker
     tracker = PersonTracker(motors, arduino)
     if config.TRACKING_ENABLED and control_mode == 'auto':
         tracker.enable()
     
+    # Start the shared video pipeline (runs once for all viewers)
+    broadcaster = StreamBroadcaster()
+    broadcaster.start()
+    
+    # Coalesced motor/sensor status updates
+    socketio.start_background_task(status_broadcast_loop)
+    
     print("System initialized successfully!")
 
 
+class StreamBroadcaster:
+    """
+    Runs capture + detection + JPEG encoding once in a background task
+    and pushes each encoded frame to every client as one binary SocketIO event
+    """
+    
+    def __init__(self):
+        self.latest_jpeg = None  # Sent to clients as they connect, so they get a picture at once
+        self.running = False
+    
+    def start(self):
+        """Start the frame pipeline task"""
+        self.running = True
+        socketio.start_background_task(self._run)
+        print("Video broadcaster started")
+    
+    def _run(self):
+        """
+        Broadcast every frame produced by generate_frames()
+        Supervised: if the pipeline ever ends, it's restarted after a pause,
+        since every viewer (and auto-tracking) depends on this one task
+        """
+        while self.running:
+            try:
+                for jpeg in generate_frames():
+                    if not self.running:
+                        return
+                    self.latest_jpeg = jpeg
+                    socketio.emit('frame', jpeg)
+            except Exception as e:
+                print(f"Video pipeline error: {e}")
+            if self.running:
+                print("Video pipeline stopped - restarting in 1s")
+                socketio.sleep(1.0)
+    
+    def stop(self):
+        """Stop the frame pipeline (the task exits after its current frame)"""
+        self.running = False
+
+
+class JpegQualityController:
+    """
+    Tunes JPEG quality (and output scale) at runtime so encoding fits in the
+    time left over after inference for each streamed frame, then the stream
+    frame rate once quality alone can't keep up
+    """
+    
+    def __init__(self):
+        # Settings read once - record() runs every frame
+        self.adaptive = config.ADAPTIVE_JPEG
+        self.quality_min = config.JPEG_QUALITY_MIN
+        self.quality_max = config.JPEG_QUALITY_MAX
+        self.adaptive_fps = config.ADAPTIVE_FPS
+        self.fps_min = config.STREAM_FPS_MIN
+        self.fps_max = config.STREAM_FPS_LIMIT
+        self.set_fps(config.STREAM_FPS_LIMIT)
+        self.slow_link_rtt_ms = config.SLOW_LINK_RTT_MS
+        self.slow_link_scale = config.SLOW_LINK_SCALE
+        
+        self.quality = config.JPEG_QUALITY
+        self.scale = 1.0
+        self.encode_time = 0.0  # EWMA (seconds)
+        self.infer_time = 0.0   # EWMA (seconds)
+        self.frames_since_change = 0
+    
+    def set_fps(self, fps):
+        """Set the target stream rate and the matching frame budget"""
+        self.fps = fps
+        self.frame_budget = 1 / fps
+        self.frame_period_ns = int(1e9 / fps)
+    
+    def record(self, infer_time, encode_time, alpha=0.2):
+        """Update timing averages and adjust quality or frame rate every few frames"""
+        self.infer_time += alpha * (infer_time - self.infer_time)
+        self.encode_time += alpha * (encode_time - self.encode_time)
+        self.frames_since_change += 1
+        if not (self.adaptive or self.adaptive_fps) or self.frames_since_change < 10:
+            return
+        
+        # Time left for encoding once inference is done
+        frame_budget = self.frame_budget
+        budget = max(frame_budget - self.infer_time, 0.1 * frame_budget)
+        
+        if self.adaptive:
+            if self.encode_time > 0.5 * budget and self.quality > self.quality_min:
+                self.quality = max(self.quality - 5, self.quality_min)
+                self.frames_since_change = 0
+                return
+            if self.encode_time < 0.2 * budget and self.quality < self.quality_max:
+                self.quality = min(self.quality + 5, self.quality_max)
+                self.frames_since_change = 0
+                return
+        
+        # Quality settled - trade frame rate for headroom
+        if self.adaptive_fps:
+            busy = self.infer_time + self.encode_time
+            if busy > frame_budget and self.fps > self.fps_min:
+                self.set_fps(self.fps - 1)
+                self.frames_since_change = 0
+            elif busy < 0.6 * frame_budget and self.fps < self.fps_max:
+                self.set_fps(self.fps + 1)
+                self.frames_since_change = 0
+    
+    def update_link(self, client_rtts):
+        """Downscale the stream while any viewer is on a slow link"""
+        slow_rtt = self.slow_link_rtt_ms
+        slow = any(rtt > slow_rtt for rtt in client_rtts.values())
+        self.scale = self.slow_link_scale if slow else 1.0
+
+
+def sleep_until_next_frame(next_frame_ns, frame_period_ns):
+    """
+    Sleep until a frame deadline so the stream holds STREAM_FPS_LIMIT without drift
+    
+    Args:
+        next_frame_ns: Deadline from time.perf_counter_ns()
+        frame_period_ns: Target frame period (1e9 / STREAM_FPS_LIMIT)
+        
+    Returns:
+        int: The following frame's deadline
+    """
+    now_ns = time.perf_counter_ns()
+    if next_frame_ns > now_ns:
+        socketio.sleep((next_frame_ns - now_ns) / 1e9)
+    else:
+        next_frame_ns = now_ns  # Fell behind - don't burst to catch up
+    return next_frame_ns + frame_period_ns
+
+
 def generate_frames():
     """
-    Generator function for MJPEG streaming
-    Yields frames with detection and overlays
+    Generator function for the video pipeline
+    Yields JPEG-encoded frames with detection and overlays (sent over SocketIO)
     """
     global detector, arduino, tracker, control_mode, current_fps
     
-    frame_time = time.time()
+    last_frame_ns = time.perf_counter_ns()
+    ewma_dt_ns = 0  # Smoothed frame period
+    next_frame_ns = last_frame_ns
     fps = 0
+    jpeg_control = JpegQualityController()
+    read_failures = 0
+    errors = 0  # Consecutive frames that raised
+    
+    # Bind settings to locals once instead of looking them up every frame
+    max_read_failures = config.CAMERA_MAX_READ_FAILURES
+    passthrough = config.MJPEG_PASSTHROUGH
     
     while True:
         try:
             # Read frame from camera
             success, frame = detector.read_frame()
             if not success:
-                print("Failed to read frame from camera")
-                break
+                # Camera glitch - back off cooperatively (other clients keep
+                # being served) and retry instead of ending the stream
+                read_failures += 1
+                if read_failures == 1:
+                    print("Failed to read frame from camera, retrying...")
+                if read_failures >= max_read_failures:
+                    print("Camera did not recover - reopening it")
+                    blocking_call(detector.reopen_camera)
+                    read_failures = 0
+                    socketio.sleep(1.0)
+                    continue
+                socketio.sleep(0.1)
+                continue
+            read_failures = 0
             
             # Detect humans
+            infer_start = time.perf_counter()
             processed_frame, human_count = detector.detect_humans(frame)
+            infer_time = time.perf_counter() - infer_start
             
             # Get Arduino sensor data
             arduino_data = arduino.get_data()
-            distance = arduino_data['distance']
+            distance = arduino_data.distance
             
             # Log sensor data
             if sensor_logger:
@@ -98,19 +354,16 @@ def generate_frames():
             
             # Auto-tracking if enabled
             if control_mode == 'auto' and tracker.enabled:
-                # Get detections for tracking (safe extraction)
-                detections = []
+                # Get detections for tracking as an (N,4) array (no per-box Python objects)
                 try:
-                    if detector.last_results and len(detector.last_results) > 0:
-                        result = detector.last_results[0]
-                        if hasattr(result, 'boxes') and result.boxes is not None:
-                            boxes = result.boxes.xyxy.cpu().numpy()
-                            detections = boxes.tolist()
+                    detections = detector.get_detections()
                 except Exception as e:
                     print(f"Detection extraction error: {e}")
-                    detections = []
+                    detections = np.empty((0, 4), dtype=np.float32)
                 
-                tracking_status = tracker.process_detection(detections, human_count)
+                # Age of the detections themselves (async backends lag the frame just read)
+                tracking_status = tracker.process_detection(detections, human_count, arduino_data,
+                                                             detector.detections_ns)
                 
                 # Check for emergency stop condition
                 if tracking_status.get('status') == 'EMERGENCY_STOP':
@@ -120,12 +373,24 @@ def generate_frames():
                         'threshold': tracking_status.get('threshold')
                     })
             
-            # Calculate FPS
-            current_time = time.time()
-            fps = 1 / (current_time - frame_time) if (current_time - frame_time) > 0 else 0
-            frame_time = current_time
+            # Calculate FPS from an EWMA of frame periods (1/8 weight on the newest)
+            now_ns = time.perf_counter_ns()
+            dt_ns = now_ns - last_frame_ns
+            last_frame_ns = now_ns
+            ewma_dt_ns = dt_ns if ewma_dt_ns == 0 else (ewma_dt_ns * 7 + dt_ns) >> 3
+            fps = 1e9 / ewma_dt_ns if ewma_dt_ns > 0 else 0
             current_fps = fps  # Store globally for status endpoint
             
+            # Nothing to draw - stream the camera's own JPEG without re-encoding
+            # (FPS and mode are still shown on the dashboard)
+            camera_jpeg = detector.last_jpeg
+            if (passthrough and camera_jpeg is not None
+                    and human_count == 0 and processed_frame is frame):
+                errors = 0
+                yield camera_jpeg
+                next_frame_ns = sleep_until_next_frame(next_frame_ns, jpeg_control.frame_period_ns)
+                continue
+            
             # Add information overlay
             processed_frame = detector.add_info_overlay(
                 processed_frame, 
@@ -134,31 +399,60 @@ def generate_frames():
                 fps
             )
             
-            # Add mode indicator
-            mode_text = f"Mode: {control_mode.upper()}"
-            cv2.putText(processed_frame, mode_text, (10, processed_frame.shape[0] - 20),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            # Add mode indicator (pre-rendered once per mode)
+            if detector.draw_overlay:
+                mode_text = f"Mode: {control_mode.upper()}"
+                detector.draw_text(processed_frame, mode_text, (10, processed_frame.shape[0] - 20),
+                                   0.6, (0, 255, 255), 2)
             
-            # Encode frame as JPEG
-            ret, buffer = cv2.imencode('.jpg', processed_frame, 
-                                      [cv2.IMWRITE_JPEG_QUALITY, config.JPEG_QUALITY])
+            # Encode frame as JPEG (quality/scale tuned to the frame budget)
+            encode_start = time.perf_counter()
+            jpeg_control.update_link(client_rtts)
+            if jpeg_control.scale != 1.0:
+                processed_frame = cv2.resize(processed_frame, None, fx=jpeg_control.scale,
+                                             fy=jpeg_control.scale, interpolation=cv2.INTER_AREA)
+            frame_bytes = blocking_call(detector.encode_jpeg, processed_frame, jpeg_control.quality)
+            jpeg_control.record(infer_time, time.perf_counter() - encode_start)
             
-            if not ret:
+            if frame_bytes is None:
                 continue
             
-            # Convert to bytes
-            frame_bytes = buffer.tobytes()
-            
-            # Yield frame in MJPEG format
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            errors = 0
+            yield frame_bytes
             
-            # Limit FPS for streaming
-            time.sleep(1 / config.STREAM_FPS_LIMIT)
+            # Limit FPS for streaming (yields to other clients under eventlet)
+            next_frame_ns = sleep_until_next_frame(next_frame_ns, jpeg_control.frame_period_ns)
             
         except Exception as e:
-            print(f"Error in frame generation: {e}")
-            break
+            # One bad frame must not end the stream (and tracking) for every client
+            errors += 1
+            if errors == 1:
+                print(f"Error in frame generation: {e}")
+            socketio.sleep(0.1)
+
+
+def status_broadcast_loop():
+    """
+    Send motor status and sensor data to all clients at a fixed rate
+    Only sends when something changed, so key-repeat doesn't flood clients
+    """
+    last_motor_status = None
+    last_sensor_update = None
+    
+    while True:
+        socketio.sleep(config.STATUS_BROADCAST_INTERVAL)
+        
+        if motors:
+            motor_status = motors.get_status()
+            if motor_status != last_motor_status:
+                socketio.emit('motor_status', motor_status)
+                last_motor_status = motor_status
+        
+        if arduino:
+            arduino_data = arduino.get_data()
+            if arduino_data.timestamp != last_sensor_update:
+                socketio.emit('sensor_data', arduino_data._asdict())
+                last_sensor_update = arduino_data.timestamp
 
 
 @app.route('/')
@@ -167,28 +461,40 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/video_feed')
-def video_feed():
-    """Video streaming route. Returns MJPEG stream"""
-    return Response(
-        generate_frames(),
-        mimetype='multipart/x-mixed-replace; boundary=frame'
-    )
+def cached_json_response(cache, build):
+    """
+    Serve a JSON body that is rebuilt at most every STATUS_CACHE_TTL seconds
+    Absorbs many dashboards polling the same data
+    
+    Args:
+        cache: Dict with 'expires' and 'body' keys
+        build: Function returning the dict to serialize
+    """
+    now = time.monotonic()
+    if now >= cache['expires']:
+        cache['body'] = json_dumps(build())
+        cache['expires'] = now + config.STATUS_CACHE_TTL
+    return Response(cache['body'], mimetype='application/json')
 
 
 @app.route('/status')
 def status():
     """Return system status as JSON"""
+    return cached_json_response(_status_cache, build_status)
+
+
+def build_status():
+    """Build the /status payload"""
     global arduino, motors, tracker, control_mode, current_fps
     
-    arduino_data = arduino.get_data() if arduino else {
+    arduino_data = arduino.get_data()._asdict() if arduino else {
         'accelX': None, 'accelY': None, 'accelZ': None,
         'gyroX': None, 'gyroY': None, 'gyroZ': None,
         'temperature': None, 'distance': None
     }
     motor_status = motors.get_status() if motors else {'direction': 'stopped', 'speed': 0}
     
-    return jsonify({
+    return {
         'status': 'running',
         'mode': control_mode,
         'camera_resolution': f"{config.CAMERA_WIDTH}x{config.CAMERA_HEIGHT}",
@@ -197,7 +503,7 @@ def status():
         'motor_status': motor_status,  # Changed from 'motors' to 'motor_status'
         'tracking_status': {'enabled': tracker.enabled if tracker else False},
         'fps': current_fps
-    })
+    }
 
 @app.route('/sensor_data')
 def sensor_data():
@@ -205,7 +511,7 @@ def sensor_data():
     global arduino
     
     if arduino:
-        return jsonify(arduino.get_data())
+        return cached_json_response(_sensor_cache, lambda: arduino.get_data()._asdict())
     return jsonify({'error': 'Arduino not initialized'})
 
 
@@ -269,14 +575,28 @@ def handle_connect():
     """Client connected"""
     print('Client connected')
     emit('status', {'mode': control_mode, 'connected': True})
+    # Last broadcast frame right away instead of a blank view until the next one
+    if broadcaster and broadcaster.latest_jpeg:
+        emit('frame', broadcaster.latest_jpeg)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Client disconnected"""
     print('Client disconnected')
+    client_rtts.pop(request.sid, None)
     if control_mode == 'manual':
         motors.stop()
 
+@socketio.on('rtt_probe')
+def handle_rtt_probe(client_time):
+    """Echo the client's timestamp so it can measure round-trip time"""
+    return client_time
+
+@socketio.on('client_rtt')
+def handle_client_rtt(data):
+    """Client reports its measured round-trip time (used to size the stream)"""
+    client_rtts[request.sid] = data.get('rtt', 0)
+
 @socketio.on('set_mode')
 def handle_set_mode(data):
     """Switch between auto/manual mode"""
@@ -317,7 +637,7 @@ def handle_manual_control(data):
     elif command == 'stop':
         motors.stop()
     
-    emit('motor_status', motors.get_status(), broadcast=True)
+    # motor_status is broadcast by status_broadcast_loop()
 
 @socketio.on('emergency_stop')
 def handle_emergency_stop():
@@ -335,10 +655,13 @@ def handle_emergency_stop():
 
 def cleanup():
     """Clean up resources on shutdown"""
-    global detector, motors, arduino, tracker
+    global detector, motors, arduino, tracker, broadcaster
     
     print("\nShutting down...")
     
+    if broadcaster:
+        broadcaster.stop()
+    
     if tracker:
         tracker.disable()
     
@@ -366,14 +689,18 @@ if __name__ == '__main__':
         print(f"Mode: {control_mode.upper()}")
         print(f"{'='*70}\n")
         
-        # Run Flask app with SocketIO
-        socketio.run(
-            app,
-            host=config.HOST,
-            port=config.PORT,
-            debug=config.DEBUG,
-            allow_unsafe_werkzeug=True
-        )
+        # Run Flask app with SocketIO (eventlet WSGI server when available)
+        print(f"SocketIO async mode: {ASYNC_MODE}")
+        if ASYNC_MODE == 'eventlet':
+            socketio.run(app, host=config.HOST, port=config.PORT, debug=config.DEBUG)
+        else:
+            socketio.run(
+                app,
+                host=config.HOST,
+                port=config.PORT,
+                debug=config.DEBUG,
+                allow_unsafe_werkzeug=True
+            )
         
     except KeyboardInterrupt:
         print("\n\nReceived interrupt signal...")
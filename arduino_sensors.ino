@@ -16,10 +16,34 @@
 #define MQ2_PIN A0
 #define CCS811_ADDR 0x5A
 
+// 1 = send fixed-size binary frames (set ARDUINO_BINARY = True in config.py)
+// 0 = send JSON lines
+#define BINARY_FRAMES 0
+
 // Objects
 Adafruit_MPU6050 mpu;
 CCS811 airSensor(CCS811_ADDR);
 
+// CRC-8 (poly 0x07), must match crc8() in arduino_serial.py
+uint8_t crc8(const uint8_t *data, size_t len) {
+  uint8_t crc = 0;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+// Frame: 0xAA 0x55, 11 little-endian floats, CRC-8 of the floats
+void sendBinaryFrame(const float *values, size_t count) {
+  const uint8_t header[2] = {0xAA, 0x55};
+  Serial.write(header, 2);
+  Serial.write((const uint8_t *)values, count * sizeof(float));
+  Serial.write(crc8((const uint8_t *)values, count * sizeof(float)));
+}
+
 void setup() {
   Serial.begin(115200);
   Serial.println("Starting sensors...");
@@ -81,6 +105,15 @@ void loop() {
   }
 
   // ---- Serial Output ----
+#if BINARY_FRAMES
+  float frame[11] = {
+    distance, (float)mq2Value,
+    a.acceleration.x, a.acceleration.y, a.acceleration.z,
+    g.gyro.x, g.gyro.y, g.gyro.z,
+    temp.temperature, co2, tvoc
+  };
+  sendBinaryFrame(frame, 11);
+#else
   Serial.print("{\"distCM\":");
   Serial.print(distance, 1);
   
@@ -110,6 +143,7 @@ void loop() {
   Serial.print(tvoc, 0);
   
   Serial.println("}");
+#endif
 
   delay(1000);
 }
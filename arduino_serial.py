@@ -4,54 +4,471 @@ Reads sensor data from Arduino UNO R4 WiFi
 Sensors: HC-SR04, MPU6050, MQ-2, CCS811 (air quality)
 """
 import serial
+from serial.tools import list_ports
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import logging
+import operator
+import numpy as np
+import os
+import queue
+import re
+import selectors
+import struct
+import sys
 import threading
 import time
 
+# Per-packet debug output - arguments are only formatted when DEBUG is enabled
+log = logging.getLogger("arduino")
+
+# Fastest available JSON parser - all of them accept bytes and raise ValueError
+try:
+    import orjson
+    json_loads = orjson.loads  # Parses bytes directly, much faster than json
+except ImportError:
+    try:
+        import ujson
+        json_loads = ujson.loads
+    except ImportError:
+        json_loads = json.loads
+
+# Numba JIT for the CSV float parser (optional)
+try:
+    from numba import njit
+    USE_NUMBA = True
+except ImportError:
+    USE_NUMBA = False
+
+# probe(): a JSON line from our sketch, matched on raw bytes (no decode, no full parse)
+SENSOR_JSON_LINE = re.compile(rb'^\{.*"accelX".*"gyroX"')
+
+# USB vendor IDs of Arduino boards and common USB-serial bridges
+# (Arduino, Arduino.org, WCH CH340, Silicon Labs CP210x, FTDI)
+ARDUINO_USB_VIDS = {0x2341, 0x2A03, 0x1A86, 0x10C4, 0x0403}
+
+# Last port autodetect() found the Arduino on - probed first on the next run
+PORT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'elec290', 'arduino_port.json')
+
+# How long to wait for the first sensor line after opening the port: a running
+# sketch prints every second (delay(1000) in arduino_sensors.ino), and one reset by
+# the open itself boots and prints within the 2 s the old fixed sleep allowed
+SKETCH_FIRST_LINE_S = 2.0
+
+# Binary frame (BINARY_FRAMES in arduino_sensors.ino): 0xAA 0x55 header,
+# 11 little-endian float32 values, CRC-8 of the float bytes
+FRAME_HEADER = b'\xaa\x55'
+BINARY_FRAME = struct.Struct('<2s11fB')
+FRAME_PAYLOAD_SIZE = BINARY_FRAME.size - len(FRAME_HEADER) - 1
+
+# Sensor history columns - same order as the binary frame payload
+SENSOR_FIELDS = ('distance', 'mq2', 'accel_x', 'accel_y', 'accel_z',
+                 'gyro_x', 'gyro_y', 'gyro_z', 'temperature', 'co2', 'tvoc')
+# JSON line keys for each SENSOR_FIELDS column: (accepted keys, default)
+JSON_SCHEMA = (
+    (('distCM', 'dist'), 0),
+    (('mq2',), 0),
+    (('accelX',), 0),
+    (('accelY',), 0),
+    (('accelZ',), 0),
+    (('gyroX',), 0),
+    (('gyroY',), 0),
+    (('gyroZ',), 0),
+    (('tempC', 'temp'), 0),
+    (('co2',), -1),
+    (('tvoc',), -1),
+)
+
+# get_data() snapshot - immutable, so one instance can be shared by every caller
+SensorData = collections.namedtuple(
+    'SensorData',
+    'accelX accelY accelZ gyroX gyroY gyroZ temperature distance mq2 co2 tvoc timestamp'
+)
+
+HISTORY_SIZE = 1024  # Samples kept in the ring buffer (~50 s at 20 Hz)
+
+# Simulated sensor ranges (SENSOR_FIELDS order); accel_z ~9.8 m/s² gravity
+SIM_LOW = np.array([5, 100, -2, -2, 9, -0.5, -0.5, -0.5, 20, 400, 0], np.float32)
+SIM_HIGH = np.array([50, 600, 2, 2, 11, 0.5, 0.5, 0.5, 30, 1200, 500], np.float32)
+
+
+def _build_crc8_table(poly=0x07):
+    """CRC-8 (poly 0x07) lookup table, same as crc8() in the Arduino sketch"""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+CRC8_TABLE = _build_crc8_table()
+
+
+def crc8(data):
+    """CRC-8 of a bytes-like object"""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def _parse_csv_floats(buf, out):
+    """
+    Parse comma-separated decimal numbers from raw bytes in one pass
+    
+    Args:
+        buf: uint8 array of the line (no newline)
+        out: float64 array receiving the values
+    
+    Returns:
+        int: Number of values parsed, or -1 if the line is malformed
+    """
+    count = 0
+    value = 0.0
+    scale = 0.0   # 0 while in the integer part, then 0.1, 0.01, ...
+    sign = 1.0
+    digits = 0
+    for i in range(buf.shape[0]):
+        c = buf[i]
+        if 48 <= c <= 57:  # '0'-'9'
+            if scale == 0.0:
+                value = value * 10.0 + (c - 48)
+            else:
+                value += (c - 48) * scale
+                scale *= 0.1
+            digits += 1
+        elif c == 46:  # '.'
+            if scale != 0.0:
+                return -1
+            scale = 0.1
+        elif c == 45 and digits == 0 and sign > 0:  # leading '-'
+            sign = -1.0
+        elif c == 44:  # ','
+            if digits == 0 or count >= out.shape[0]:
+                return -1
+            out[count] = sign * value
+            count += 1
+            value = 0.0
+            scale = 0.0
+            sign = 1.0
+            digits = 0
+        elif c != 32 and c != 13:  # Ignore spaces and '\r'
+            return -1
+    if digits == 0 or count >= out.shape[0]:
+        return -1
+    out[count] = sign * value
+    return count + 1
+
+
+_parse_csv_floats_jit = None  # Compiled _parse_csv_floats, built on first use
+
+
+def _compile_csv_parser():
+    """
+    JIT-compile _parse_csv_floats (numba compiles lazily, so compiler or cache
+    problems only show up on the first call - catch them here, once)
+    Falls back to an uncached build, then turns USE_NUMBA off
+    
+    Returns:
+        The compiled parser, or None if numba can't build it
+    """
+    global USE_NUMBA, _parse_csv_floats_jit
+    for cache in (True, False):
+        try:
+            parser = njit(cache=cache)(_parse_csv_floats)
+            parser(np.frombuffer(b'0', np.uint8), np.empty(8, np.float64))  # Compile now
+        except Exception as e:
+            error = e
+            continue
+        _parse_csv_floats_jit = parser
+        return parser
+    USE_NUMBA = False
+    log.warning("Numba CSV parser unavailable (%s) - using the Python parser", error)
+    return None
+
+
+def find_arduino_ports(preferred=None):
+    """
+    List plugged-in Arduino-like serial ports without opening any of them
+    
+    Args:
+        preferred: Port to try first if it exists (e.g. config.ARDUINO_PORT)
+    
+    Returns:
+        list: Device paths, preferred port first, then known Arduino/bridge vendor IDs
+    """
+    ports = [
+        p for p in list_ports.comports()
+        if p.vid in ARDUINO_USB_VIDS or 'USB' in (p.hwid or '') or 'ACM' in p.device
+        or 'Arduino' in (p.manufacturer or '')
+    ]
+    # Known vendor IDs first, so autodetect() rarely has to open anything else
+    ports.sort(key=lambda p: p.vid not in ARDUINO_USB_VIDS)
+    candidates = [p.device for p in ports]
+    if preferred and (preferred in candidates or os.path.exists(preferred)):
+        candidates = [preferred] + [device for device in candidates if device != preferred]
+    return candidates
+
+
+def set_low_latency(ser):
+    """
+    Ask the USB-serial driver to ship short packets right away
+    FTDI chips otherwise hold small reads for their 16 ms latency timer, so each
+    JSON line arrives late and lines get coalesced. No-op where unsupported
+    
+    Args:
+        ser: Open serial.Serial
+    """
+    try:
+        ser.set_low_latency_mode(True)  # ASYNC_LOW_LATENCY (pyserial >= 3.5, Linux)
+    except (AttributeError, NotImplementedError, OSError, ValueError):
+        pass
+    
+    # FTDI latency timer itself (usually needs root, CDC-ACM boards don't have one)
+    tty = os.path.basename(os.path.realpath(ser.port))
+    try:
+        with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", 'w') as f:
+            f.write('1')
+    except OSError:
+        pass
+
+
+def open_port(port, baudrate, timeout):
+    """
+    Open a serial port with DTR de-asserted
+    Asserting DTR on open is what auto-resets most Arduinos, so where the driver
+    honours it a running sketch keeps streaming (Linux cdc_acm/ch341 raise DTR on
+    open anyway, so the board may still reset - see wait_for_first_line)
+    
+    Returns:
+        serial.Serial: Open port, low-latency mode on where supported
+    """
+    ser = serial.Serial()
+    ser.port = port
+    ser.baudrate = baudrate
+    ser.timeout = timeout
+    ser.dtr = False
+    ser.open()
+    set_low_latency(ser)
+    return ser
+
+
+def is_sensor_line(line):
+    """Cheap check that a stripped line looks like a sensor reading (JSON or CSV)"""
+    if line[:1] == b'{':
+        return SENSOR_JSON_LINE.match(line) is not None
+    return line.count(b',') == 7
+
+
+def wait_for_first_line(ser, max_s=SKETCH_FIRST_LINE_S, binary=False):
+    """
+    Wait until the sketch sends its first sensor line
+    Replaces a fixed sleep: returns as soon as a running sketch (or one that is
+    finishing the reset the port open caused) starts talking. No DTR pulse of its
+    own - Linux cdc_acm/ch341 raise DTR on open whatever ser.dtr says, so the
+    board has already reset if it was going to
+    
+    Args:
+        ser: Open serial.Serial
+        max_s: Longest to wait
+        binary: Wait for a binary frame header instead of a text line
+    
+    Returns:
+        bool: True if the sketch talked before max_s
+    """
+    buffer = bytearray()
+    deadline = time.monotonic() + max_s
+    while time.monotonic() < deadline:
+        waiting = ser.in_waiting
+        if waiting:
+            buffer += ser.read(waiting)
+            if binary:
+                if FRAME_HEADER in buffer:
+                    return True
+            else:
+                *lines, buffer = buffer.split(b'\n')
+                if any(is_sensor_line(line.strip()) for line in lines):
+                    return True
+        time.sleep(0.02)
+    return False
+
+
+def probe(port, baudrate=115200, n=3, max_s=5):
+    """
+    Check that a port is streaming sensor lines (JSON or CSV)
+    Returns as soon as n valid lines arrive instead of waiting out max_s
+    
+    Args:
+        port: Serial port to open
+        baudrate: Baud rate
+        n: Valid lines required
+        max_s: Give up after this many seconds (includes the Arduino reset)
+    
+    Returns:
+        bool: True if the port sent n valid lines in time
+    """
+    try:
+        ser = open_port(port, baudrate, timeout=0)  # Non-blocking: drain whatever is there
+    except (OSError, serial.SerialException):
+        return False
+    
+    valid_lines = 0
+    buffer = bytearray()
+    deadline = time.monotonic() + max_s
+    try:
+        while time.monotonic() < deadline:
+            # One read per poll for everything buffered, split into lines in memory
+            buffer += ser.read(ser.in_waiting or 1)
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if not is_sensor_line(line.strip()):
+                    continue
+                valid_lines += 1
+                if valid_lines >= n:
+                    return True
+            time.sleep(0.02)  # Let a few lines accumulate instead of spinning
+    except (OSError, serial.SerialException):
+        pass
+    finally:
+        ser.close()
+    return False
+
+
+def load_cached_port():
+    """Last port autodetect() succeeded on, or None"""
+    try:
+        with open(PORT_CACHE, 'rb') as f:
+            return json_loads(f.read())['port']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached_port(port):
+    """Remember a working port (written to a temp file and renamed, so never half-written)"""
+    try:
+        os.makedirs(os.path.dirname(PORT_CACHE), exist_ok=True)
+        tmp_path = PORT_CACHE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'port': port}, f)
+        os.replace(tmp_path, PORT_CACHE)
+    except OSError:
+        pass
+
+
+def forget_cached_port():
+    """Drop the cached port so the next autodetect() does a full scan"""
+    try:
+        os.remove(PORT_CACHE)
+    except OSError:
+        pass
+
+
+def autodetect(baudrate=115200, use_cache=True):
+    """
+    Find the port the Arduino sketch is streaming on
+    The last working port is probed on its own first, so a full scan only
+    happens when the Arduino moved (or on the very first run)
+    
+    Args:
+        baudrate: Baud rate
+        use_cache: Try the cached last-known-good port first
+    
+    Returns:
+        str: Port of the first candidate that passes probe(), or None
+    """
+    cached = load_cached_port() if use_cache else None
+    if cached and os.path.exists(cached):
+        if probe(cached, baudrate):
+            return cached
+    if cached:
+        forget_cached_port()
+    
+    ports = [port for port in find_arduino_ports() if port != cached]
+    found = None
+    if len(ports) == 1:
+        found = ports[0] if probe(ports[0], baudrate) else None
+    elif ports:
+        # Probes are almost all waiting (reset + serial I/O), so run them side by side
+        executor = ThreadPoolExecutor(max_workers=len(ports))
+        futures = {executor.submit(probe, port, baudrate): port for port in ports}
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    found = futures[future]
+                    break
+        finally:
+            # Losing probes close their own ports when their deadline passes
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    if found:
+        save_cached_port(found)
+    return found
+
 
 class ArduinoSerial:
-    def __init__(self, port='/dev/ttyUSB0', baudrate=115200, debug=False):
+    def __init__(self, port='/dev/ttyUSB0', baudrate=115200, debug=False, binary=False,
+                 schema=JSON_SCHEMA):
         """
         Initialize Arduino serial communication
         
         Args:
-            port: Serial port (default: /dev/ttyUSB0, could be /dev/ttyACM0)
+            port: Serial port (default: /dev/ttyUSB0, could be /dev/ttyACM0, None to autodetect)
             baudrate: Baud rate (default: 115200)
             debug: Enable debug output (default: False)
+            binary: Arduino sends binary frames instead of JSON lines (default: False)
+            schema: JSON keys per SENSOR_FIELDS column (default: JSON_SCHEMA)
         """
         self.port = port
         self.baudrate = baudrate
         self.serial = None
         self.running = False
         self.thread = None
+        self.parse_thread = None
+        self._chunks = queue.Queue()  # Raw serial bytes from the I/O thread
         self.debug = debug
+        self.binary = binary
+        self._schema = tuple((tuple(map(sys.intern, keys)), default) for keys, default in schema)
+        # Fast path: every primary key present -> all values in one C call
+        self._get_primary = operator.itemgetter(*(keys[0] for keys, _ in self._schema))
+        self._lines_read = 0
+        self._status_timer = None
         
-        # Sensor data - Motion & Environment
-        self.accel_x = 0
-        self.accel_y = 0
-        self.accel_z = 0
-        self.gyro_x = 0
-        self.gyro_y = 0
-        self.gyro_z = 0
-        self.temperature = 0
-        self.distance = 0
-        
-        # Air Quality Sensors (NEW)
-        self.mq2 = 0        # Gas sensor (0-1023)
-        self.co2 = 0        # CO2 in ppm
-        self.tvoc = 0       # Total Volatile Organic Compounds in ppb
+        log.setLevel(logging.DEBUG if debug else logging.WARNING)
+        if not log.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("[Arduino] %(message)s"))
+            log.addHandler(handler)
+            log.propagate = False
+        
+        # Sensor history - one row per sample (columns: SENSOR_FIELDS)
+        # Motion, environment and air quality (mq2 0-1023, co2 ppm, tvoc ppb)
+        self._buf = np.zeros((HISTORY_SIZE, len(SENSOR_FIELDS)), np.float32)
+        self._head = 0  # Total samples written; newest row is (_head - 1) % HISTORY_SIZE
+        self._csv_values = np.empty(8, np.float64)  # Scratch output for the CSV parser
+        self._rng = np.random.default_rng()  # Simulation mode
         
         self.last_update = time.time()
         
-        # Try multiple common ports if default fails
-        ports_to_try = [port, '/dev/ttyACM0', '/dev/ttyUSB0', '/dev/ttyUSB1']
+        # get_data() snapshot, rebuilt only when last_update changes
+        self._snapshot = None
+        
+        # Only try ports that are actually plugged in (no blind probing)
+        if port is None:
+            port = autodetect(baudrate)
+        ports_to_try = find_arduino_ports(port)
         
         for try_port in ports_to_try:
             try:
                 if self.debug:
                     print(f"Trying to connect to {try_port}...")
-                self.serial = serial.Serial(try_port, baudrate, timeout=1)
-                time.sleep(2)  # Wait for Arduino to reset
+                self.serial = open_port(try_port, baudrate, timeout=0.5)
+                # Running sketch or one booting from the open's reset - no second reset
+                if not wait_for_first_line(self.serial, binary=self.binary):
+                    print(f"⚠️  No sensor data from {try_port} after {SKETCH_FIRST_LINE_S:.0f}s, "
+                          f"connecting anyway")
                 print(f"✓ Arduino connected on {try_port}")
                 self.port = try_port  # Update to actual port used
                 return
@@ -70,13 +487,13 @@ class ArduinoSerial:
         
         # If we get here, none of the ports worked
         print(f"⚠️  Could not connect to Arduino on any port")
-        print("   Tried: " + ", ".join(ports_to_try))
+        print("   Tried: " + (", ".join(ports_to_try) or "no USB serial devices found"))
         print("   Sensor data will be simulated")
         print("\nTroubleshooting:")
         print("  1. Check if Arduino is plugged in: ls /dev/tty* | grep -E 'USB|ACM'")
         print("  2. Verify Arduino sketch is uploaded")
         print("  3. Close Arduino IDE Serial Monitor if open")
-        print("  4. Run: python3 debug_arduino.py")
+        print("  4. Run: python3 -c 'import arduino_serial; print(arduino_serial.autodetect())'")
     
     def start(self):
         """Start reading data in background thread"""
@@ -89,143 +506,254 @@ class ArduinoSerial:
         else:
             self.running = True
             self.thread = threading.Thread(target=self._read_loop, daemon=True)
+            self.parse_thread = threading.Thread(target=self._parse_loop, daemon=True)
             self.thread.start()
+            self.parse_thread.start()
             print("Arduino: Started reading sensor data")
+            if self.debug:
+                self._log_status()
+    
+    def _log_status(self):
+        """Debug status line every 5 seconds, off the parser thread"""
+        if not self.running:
+            return
+        if self._status_timer is not None:
+            log.debug("Status: %d lines read, last update %.1fs ago",
+                      self._lines_read, time.time() - self.last_update)
+        self._status_timer = threading.Timer(5, self._log_status)
+        self._status_timer.daemon = True
+        self._status_timer.start()
     
     def _read_loop(self):
-        """Background thread to read serial data"""
-        lines_read = 0
-        last_debug_time = time.time()
+        """
+        Background I/O thread - only moves bytes from the serial port into a queue
+        Parsing happens on a separate thread so a slow parse never delays reads
+        """
+        fd = self.serial.fileno()
+        # Register once - epoll on Linux, no per-call fd list rebuild
+        selector = selectors.DefaultSelector()
+        selector.register(fd, selectors.EVENT_READ)
         
         while self.running:
             try:
-                if self.serial.in_waiting > 0:
-                    line = self.serial.readline().decode('utf-8', errors='ignore').strip()
+                # Sleep in the kernel until bytes arrive (or 0.5s timeout)
+                if not selector.select(timeout=0.5):
+                    continue
+                
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    raise IOError("serial port closed (Arduino unplugged?)")
+                self._chunks.put(chunk)
+                    
+            except Exception as e:
+                log.warning("Read error: %s", e, exc_info=self.debug)
+                time.sleep(0.5)  # Back off before retrying a failing port
+        
+        selector.close()
+    
+    def _parse_loop(self):
+        """Background thread - split received bytes into lines and parse them"""
+        buffer = bytearray()
+        
+        while self.running:
+            # Block until the I/O thread hands over bytes - no idle wakeups
+            chunk = self._chunks.get()
+            if chunk is None:  # Sentinel from stop()
+                break
+            buffer += chunk
+            
+            if self.binary:
+                self._lines_read += self._parse_frames(buffer)
+                continue
+            
+            # Parse every complete line, keep the partial tail for next time
+            # (one copy per line, one buffer compaction per chunk)
+            start = 0
+            with memoryview(buffer) as view:
+                while True:
+                    newline = buffer.find(b'\n', start)
+                    if newline < 0:
+                        break
+                    end = newline
+                    if end > start and buffer[end - 1] == 13:  # Drop println's '\r'
+                        end -= 1
+                    line = bytes(view[start:end])
+                    start = newline + 1
                     
                     if not line:  # Empty line
                         continue
                     
-                    if self.debug:
-                        print(f"[Arduino] Raw: {repr(line)}")
+                    log.debug("Raw: %r", line)
                     
-                    # Expected format: {"distCM":X,"mq2":X,"accelX":X,...,"co2":X,"tvoc":X}
                     try:
-                        data = json.loads(line)
-                        # Motion sensors
-                        self.accel_x = data.get('accelX', 0)
-                        self.accel_y = data.get('accelY', 0)
-                        self.accel_z = data.get('accelZ', 0)
-                        self.gyro_x = data.get('gyroX', 0)
-                        self.gyro_y = data.get('gyroY', 0)
-                        self.gyro_z = data.get('gyroZ', 0)
-                        
-                        # Environmental sensors
-                        self.temperature = data.get('tempC', data.get('temp', 0))
-                        self.distance = data.get('distCM', data.get('dist', 0))
-                        
-                        # Air quality sensors (NEW)
-                        self.mq2 = data.get('mq2', 0)
-                        self.co2 = data.get('co2', -1)
-                        self.tvoc = data.get('tvoc', -1)
-                        
-                        self.last_update = time.time()
-                        lines_read += 1
-                        
-                        if self.debug:
-                            print(f"[Arduino] Parsed: accel=({self.accel_x:.2f},{self.accel_y:.2f},{self.accel_z:.2f}), "
-                                  f"gyro=({self.gyro_x:.2f},{self.gyro_y:.2f},{self.gyro_z:.2f}), "
-                                  f"temp={self.temperature:.1f}, dist={self.distance:.1f}, "
-                                  f"mq2={self.mq2}, co2={self.co2:.0f}ppm, tvoc={self.tvoc:.0f}ppb")
-                            
-                    except json.JSONDecodeError as e:
-                        if self.debug:
-                            print(f"[Arduino] JSON error: {e}")
-                        
-                        # Try comma-separated format: accelX,accelY,accelZ,gyroX,gyroY,gyroZ,temp,dist
-                        try:
-                            parts = line.split(',')
-                            if len(parts) == 8:
-                                self.accel_x = float(parts[0])
-                                self.accel_y = float(parts[1])
-                                self.accel_z = float(parts[2])
-                                self.gyro_x = float(parts[3])
-                                self.gyro_y = float(parts[4])
-                                self.gyro_z = float(parts[5])
-                                self.temperature = float(parts[6])
-                                self.distance = float(parts[7])
-                                self.last_update = time.time()
-                                lines_read += 1
-                                
-                                if self.debug:
-                                    print(f"[Arduino] CSV parsed: accel=({self.accel_x:.2f},{self.accel_y:.2f},{self.accel_z:.2f}), "
-                                          f"gyro=({self.gyro_x:.2f},{self.gyro_y:.2f},{self.gyro_z:.2f}), "
-                                          f"temp={self.temperature:.1f}, dist={self.distance:.1f}")
-                        except (ValueError, IndexError) as parse_error:
-                            if self.debug:
-                                print(f"[Arduino] Could not parse: {parse_error}")
-                
-                # Debug output every 5 seconds
-                if self.debug and time.time() - last_debug_time > 5:
-                    print(f"[Arduino] Status: {lines_read} lines read, last update {time.time() - self.last_update:.1f}s ago")
-                    last_debug_time = time.time()
-                    
-            except Exception as e:
-                print(f"[Arduino] Read error: {e}")
-                if self.debug:
-                    import traceback
-                    traceback.print_exc()
+                        if self._parse_line(line):
+                            self._lines_read += 1
+                    except Exception as e:
+                        log.warning("Parse error: %s", e)
+            del buffer[:start]
+    
+    def _parse_frames(self, buffer):
+        """
+        Parse every complete binary frame in buffer (parsed bytes are removed)
+        One struct unpack per frame - no tokenizing or float() calls
+        
+        Returns:
+            int: Number of frames parsed
+        """
+        parsed = 0
+        while True:
+            start = buffer.find(FRAME_HEADER)
+            if start < 0:
+                del buffer[:-1]  # Last byte may be the start of a header
+                return parsed
+            if len(buffer) - start < BINARY_FRAME.size:
+                del buffer[:start]  # Wait for the rest of the frame
+                return parsed
+            
+            frame = BINARY_FRAME.unpack_from(buffer, start)
+            payload_start = start + len(FRAME_HEADER)
+            if crc8(buffer[payload_start:payload_start + FRAME_PAYLOAD_SIZE]) != frame[-1]:
+                log.debug("Bad frame CRC, resyncing")
+                del buffer[:start + 1]
+                continue
             
-            time.sleep(0.02)  # Faster polling - check for data every 20ms
+            self._record(frame[1:-1])
+            del buffer[:start + BINARY_FRAME.size]
+            parsed += 1
+    
+    def _parse_line(self, line):
+        """
+        Parse one line of sensor data (raw bytes, no UTF-8 decode needed)
+        
+        Returns:
+            bool: True if the line was parsed
+        """
+        # Expected format: {"distCM":X,"mq2":X,"accelX":X,...,"co2":X,"tvoc":X}
+        if line[:1] == b'{':
+            try:
+                data = json_loads(line)
+            except ValueError as e:
+                log.debug("JSON error: %s", e)
+                return False
+            
+            try:
+                values = self._get_primary(data)
+            except KeyError:
+                # Missing/aliased keys - one column per schema entry, first key present wins
+                values = []
+                for keys, default in self._schema:
+                    for key in keys:
+                        if key in data:
+                            values.append(data[key])
+                            break
+                    else:
+                        values.append(default)
+            self._record(values)
+            
+            log.debug("Parsed: dist=%.1f, mq2=%s, accel=(%.2f,%.2f,%.2f), "
+                      "gyro=(%.2f,%.2f,%.2f), temp=%.1f, co2=%.0fppm, tvoc=%.0fppb", *values)
+            return True
+        else:
+            # Comma-separated format: accelX,accelY,accelZ,gyroX,gyroY,gyroZ,temp,dist
+            values = None
+            if USE_NUMBA:
+                # Compiled single-pass parser - no per-field bytes/float objects
+                parser = _parse_csv_floats_jit or _compile_csv_parser()
+                if parser is not None:
+                    count = parser(np.frombuffer(line, np.uint8), self._csv_values)
+                    if count == 8:
+                        values = self._csv_values.tolist()
+            if values is None:
+                # float() path: numba unavailable, or a form the compiled parser
+                # doesn't handle (exponents, nan/inf) - both accept the same lines
+                parts = line.split(b',')
+                if len(parts) == 8:
+                    try:
+                        values = [float(part) for part in parts]
+                    except ValueError as parse_error:
+                        log.debug("Could not parse: %s", parse_error)
+                        return False
+            
+            if values is not None:
+                ax, ay, az, gx, gy, gz, temp, dist = values
+                # CSV has no air quality fields - keep the previous readings
+                row = self._buf[(self._head - 1) % HISTORY_SIZE]
+                self._record((dist, row[1], ax, ay, az, gx, gy, gz, temp, row[9], row[10]))
+                
+                log.debug("CSV parsed: accel=(%.2f,%.2f,%.2f), gyro=(%.2f,%.2f,%.2f), "
+                          "temp=%.1f, dist=%.1f", *values)
+                return True
+            log.debug("Could not parse: expected JSON or 8 CSV fields")
+            return False
     
     def _simulate_data(self):
         """Simulate sensor data when Arduino not connected"""
-        import random
+        next_tick = time.monotonic()
         while self.running:
-            self.accel_x = round(random.uniform(-2, 2), 2)
-            self.accel_y = round(random.uniform(-2, 2), 2)
-            self.accel_z = round(random.uniform(9, 11), 2)  # ~9.8 m/s² gravity
-            self.gyro_x = round(random.uniform(-0.5, 0.5), 2)
-            self.gyro_y = round(random.uniform(-0.5, 0.5), 2)
-            self.gyro_z = round(random.uniform(-0.5, 0.5), 2)
-            self.temperature = round(random.uniform(20, 30), 1)
-            self.distance = round(random.uniform(5, 50), 1)
+            # One vectorized draw per tick, SENSOR_FIELDS order
+            self._record(self._rng.uniform(SIM_LOW, SIM_HIGH))
             
-            # Simulate air quality sensors
-            self.mq2 = random.randint(100, 600)
-            self.co2 = round(random.uniform(400, 1200), 0)
-            self.tvoc = round(random.uniform(0, 500), 0)
-            
-            self.last_update = time.time()
-            time.sleep(0.05)  # Faster simulation updates - 20 Hz
+            # Pace against a fixed schedule so ticks don't drift - 20 Hz
+            next_tick += 0.05
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    
+    def _record(self, values):
+        """Write one sample (SENSOR_FIELDS order) into the ring buffer"""
+        # Fill the row before advancing _head so readers never see a partial sample
+        self._buf[self._head % HISTORY_SIZE] = values
+        self._head += 1
+        self.last_update = time.time()
+    
+    def get_window(self, n=HISTORY_SIZE):
+        """
+        Get the most recent sensor history for vectorized filtering/plotting
+        
+        Args:
+            n: Number of samples (capped at the number recorded, max HISTORY_SIZE)
+        
+        Returns:
+            np.ndarray: (n, len(SENSOR_FIELDS)) float32 copy, oldest sample first
+        """
+        n = min(n, self._head, HISTORY_SIZE)
+        end = self._head % HISTORY_SIZE
+        if n <= end:
+            return self._buf[end - n:end].copy()
+        return np.concatenate((self._buf[end - n:], self._buf[:end]))
     
     def get_data(self):
-        """Get current sensor data including air quality"""
-        return {
-            # Motion sensors
-            'accelX': self.accel_z,
-            'accelY': self.accel_y,
-            'accelZ': self.accel_x,
-            'gyroX': self.gyro_x,
-            'gyroY': self.gyro_y,
-            'gyroZ': self.gyro_z,
-            
-            # Environmental sensors
-            'temperature': self.temperature,
-            'distance': self.distance,
-            
-            # Air quality sensors
-            'mq2': self.mq2,
-            'co2': self.co2,
-            'tvoc': self.tvoc,
-            
-            'timestamp': self.last_update
-        }
+        """
+        Get current sensor data including air quality
+        Returns the same SensorData namedtuple until new data arrives
+        """
+        # The snapshot carries its own time and is published with one assignment,
+        # so concurrent callers can't pair a new time with an old (or missing) tuple
+        last_update = self.last_update
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.timestamp == last_update:
+            return snapshot
+        
+        (distance, mq2, accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z,
+         temperature, co2, tvoc) = self._buf[(self._head - 1) % HISTORY_SIZE].tolist()
+        snapshot = SensorData(
+            accel_z, accel_y, accel_x,          # Motion sensors
+            gyro_x, gyro_y, gyro_z,
+            temperature, distance,              # Environmental sensors
+            int(mq2), co2, tvoc,                # Air quality sensors
+            last_update
+        )
+        self._snapshot = snapshot
+        return snapshot
     
     def stop(self):
         """Stop reading data"""
         self.running = False
+        if self._status_timer:
+            self._status_timer.cancel()
         if self.thread:
             self.thread.join(timeout=1)
+        if self.parse_thread:
+            self._chunks.put(None)  # Wake the parser so it can exit
+            self.parse_thread.join(timeout=1)
         if self.serial:
             self.serial.close()
         print("Arduino: Stopped")
@@ -236,13 +764,18 @@ if __name__ == "__main__":
     print("Testing Arduino Serial Communication")
     print("Press Ctrl+C to exit\n")
     
-    arduino = ArduinoSerial()
+    # --no-cache: forget the last-known-good port and rescan every candidate
+    if '--no-cache' in sys.argv:
+        forget_cached_port()
+        arduino = ArduinoSerial(port=None)
+    else:
+        arduino = ArduinoSerial()
     arduino.start()
     
     try:
         while True:
             data = arduino.get_data()
-            print(f"Gas: {data['gas']}, Temp: {data['temperature']}°C, Distance: {data['distance']}cm")
+            print(f"Gas: {data.mq2}, Temp: {data.temperature:.1f}°C, Distance: {data.distance:.1f}cm")
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n\nStopping...")
@@ -1,12 +1,15 @@
 """
 Configuration settings for autonomous tracking robot car
 """
+import os
 
 # Camera settings
 CAMERA_INDEX = 0  # 0 for /dev/video0
 CAMERA_WIDTH = 320  # Optimized for Pi
 CAMERA_HEIGHT = 240
 CAMERA_FPS = 15
+CAMERA_MAX_READ_FAILURES = 50  # Consecutive failed reads (~5s) before the stream stops
+CAMERA_MJPEG = True  # Capture MJPEG from the camera and keep the raw JPEG buffers
 
 # YOLO settings
 YOLO_MODEL = 'yolov8n.pt'
@@ -14,9 +17,36 @@ CONFIDENCE_THRESHOLD = 0.35
 IOU_THRESHOLD = 0.5
 TARGET_CLASS = 0  # person
 
+# OpenVINO inference backend (exported once from YOLO_MODEL at startup)
+USE_OPENVINO = True  # Set to False to run the PyTorch model directly
+OPENVINO_DEVICE = 'intel:cpu'  # 'intel:cpu', 'intel:gpu' or 'intel:npu'
+OPENVINO_ASYNC = True  # Overlap inference with drawing/encoding (AsyncInferQueue)
+OPENVINO_NUM_REQUESTS = 2  # In-flight inference requests for async mode (1 = latency mode)
+OPENVINO_CACHE_DIR = '.ov_cache'  # Compiled model cache (faster restarts)
+YOLO_INT8 = False  # Prefer the INT8 IR (run quantize.py to calibrate on camera frames)
+
+# NCNN inference backend for ARM boards (NEON kernels) - takes precedence over OpenVINO
+USE_NCNN = False
+
+# ONNX Runtime backend (XNNPACK provider on ARM) - takes precedence over OpenVINO
+USE_ONNXRUNTIME = False
+ONNX_THREADS = 4
+
 # Performance optimization
 IMGSZ = 256
+IDLE_IMGSZ = 160  # PyTorch models: smaller input while nobody is in view (None = always IMGSZ)
+IDLE_IMGSZ_AFTER = 5  # Empty YOLO runs in a row before dropping to IDLE_IMGSZ
+THREADED_INFERENCE = True  # Non-async backends: run YOLO on a worker thread, stream never waits
+YOLO_DIRECT_INFERENCE = True  # PyTorch model: call the network directly (no Ultralytics predictor)
+YOLO_TORCHSCRIPT = True  # Direct inference: trace to TorchScript once per input size and reuse it
+INFERENCE_THREADS = 3  # PyTorch intra-op threads (leave a core for capture)
+INFERENCE_CPUS = {0, 1, 2}  # CPU affinity for PyTorch/ONNX inference calls (None = no pinning)
+CAPTURE_CPUS = {3}  # CPU affinity for the camera capture thread
 PROCESS_EVERY_N_FRAMES = 3
+USE_OPENCL = False  # Letterbox warp on the GPU via OpenCV's OpenCL (needs a working V3D/Clover driver)
+MOTION_GATE = True  # Also skip YOLO while the scene is static (32x32 frame difference)
+MOTION_GATE_THRESHOLD = 2.0  # Mean absolute gray-level change that counts as motion
+MOTION_GATE_MAX_FRAMES = 30  # Run YOLO at least this often even if nothing moves
 
 # Motor control pins (L298N) - BCM numbering
 # Updated pinout for gpiozero compatibility
@@ -26,8 +56,19 @@ IN2 = 27  # Motor A Direction 2 (Physical Pin 13)
 ENB = 25  # Motor B PWM (Physical Pin 22)
 IN3 = 23  # Motor B Direction 1 (Physical Pin 16)
 IN4 = 24  # Motor B Direction 2 (Physical Pin 18)
+# Hardware PWM for ENA/ENB (any GPIO library): move ENA/ENB to GPIO 12/13 (or 18/19),
+# add dtoverlay=pwm-2chan, then set e.g. (0, 1). None keeps software PWM on the pins above
+MOTOR_HW_PWM_CHANNELS = None
+MOTOR_HW_PWM_CHIP = 0  # 2 on Raspberry Pi 5
 
 # Motor settings
+MOTOR_COMMAND_HZ = 50  # Max motor updates per second, bursts coalesce to the newest (None = unthrottled)
+# Motor writer thread: shares the capture core (mostly idle waiting on the camera) and runs
+# SCHED_FIFO so a command isn't delayed by inference. For the tightest latency also isolate the
+# core (isolcpus=3 nohz_full=3 rcu_nocbs=3 in /boot/firmware/cmdline.txt) and use the
+# 'performance' CPU governor. Threading mode only - under eventlet it's a green thread
+MOTOR_CPUS = {3}
+MOTOR_RT_PRIORITY = 80  # None = normal scheduling
 DEFAULT_SPEED = 60  # Default motor speed (0-100)
 TURN_SPEED = 50  # Speed when turning
 MIN_SPEED = 30  # Minimum speed to overcome friction
@@ -35,7 +76,8 @@ MIN_SPEED = 30  # Minimum speed to overcome friction
 # Arduino serial settings
 ARDUINO_PORT = '/dev/ttyUSB0'  # Try /dev/ttyACM0 if this doesn't work
 ARDUINO_BAUD = 115200  # Updated for Arduino UNO R4 WiFi
-ARDUINO_DEBUG = True  # Set to True for detailed Arduino debugging
+ARDUINO_DEBUG = os.getenv('ARDUINO_DEBUG', '0') == '1'  # ARDUINO_DEBUG=1 for detailed Arduino debugging
+ARDUINO_BINARY = False  # Binary frames - must match BINARY_FRAMES in arduino_sensors.ino
 
 # Auto-tracking settings
 TRACKING_ENABLED = True
@@ -43,15 +85,60 @@ STOP_DISTANCE = 8  # Stop if Arduino distance < 8cm
 FOLLOW_DISTANCE = 50  # Ideal following distance (cm)
 PERSON_LOST_TIMEOUT = 3  # Stop if person not detected for 3 seconds
 CENTER_TOLERANCE = 50  # Pixel tolerance for "centered" detection
+TRACKING_INFERENCE_ALLOWANCE = 0.25  # Seconds of inference time allowed on top of the detection interval
+                                    # (PROCESS_EVERY_N_FRAMES frame periods) before detections count as stale
 
 # Flask server settings
 HOST = '0.0.0.0'
 PORT = 5000
-DEBUG = False
+DEBUG = os.getenv('DEBUG', '0') == '1'
 
 # Streaming settings
-JPEG_QUALITY = 60
-STREAM_FPS_LIMIT = 12
+JPEG_QUALITY = 60  # Starting quality when ADAPTIVE_JPEG is on
+ADAPTIVE_JPEG = True  # Tune quality so encoding fits the frame budget
+JPEG_QUALITY_MIN = 40
+JPEG_QUALITY_MAX = 90
+SLOW_LINK_RTT_MS = 250  # Downscale the stream if any viewer's RTT is above this
+SLOW_LINK_SCALE = 0.75
+STREAM_FPS_LIMIT = 12  # Upper bound when ADAPTIVE_FPS is on
+ADAPTIVE_FPS = True  # Lower the stream rate when the Pi can't keep up even at minimum quality
+STREAM_FPS_MIN = 5
+STATUS_BROADCAST_INTERVAL = 0.1  # Seconds between coalesced motor/sensor status pushes
+STATUS_CACHE_TTL = 0.1  # Seconds a serialized /status or /sensor_data response is reused
+MJPEG_PASSTHROUGH = True  # Stream the camera's JPEG as-is when nothing is detected (no overlay)
+STREAM_OVERLAY = True  # Draw count/FPS/mode text on streamed frames (the dashboard shows them too)
+
+# Sensor logging
+SENSOR_LOG_ENTRIES = 2000  # Readings kept for the CSV export
+SENSOR_LOG_FILE = None  # e.g. 'sensor_log.bin' to keep them in a memory-mapped file instead of RAM
 
 # Control mode
 DEFAULT_MODE = 'manual'  # 'manual' or 'auto'
+
+
+# Performance profiles - pick with ELEC290_PROFILE=pi_ultra|pi_fast|desktop
+# Each profile overrides the values above when config is imported
+PROFILE = os.getenv('ELEC290_PROFILE', 'pi_ultra')
+_PROFILES = {
+    'pi_ultra': {},  # Defaults above - lowest load on the Pi
+    'pi_fast': {
+        'CAMERA_WIDTH': 480,
+        'CAMERA_HEIGHT': 360,
+        'IMGSZ': 320,
+        'PROCESS_EVERY_N_FRAMES': 2,
+        'STREAM_FPS_LIMIT': 15,
+        'JPEG_QUALITY': 70,
+    },
+    'desktop': {
+        'CAMERA_WIDTH': 640,
+        'CAMERA_HEIGHT': 480,
+        'IMGSZ': 640,
+        'PROCESS_EVERY_N_FRAMES': 1,
+        'STREAM_FPS_LIMIT': 15,
+        'JPEG_QUALITY': 80,
+    },
+}
+if PROFILE not in _PROFILES:
+    print(f"⚠️  Unknown ELEC290_PROFILE '{PROFILE}', using pi_ultra")
+    PROFILE = 'pi_ultra'
+globals().update(_PROFILES[PROFILE])
@@ -0,0 +1,88 @@
+"""
+CPU Affinity Helper
+Pins camera, inference, motor and sensor threads to their own cores
+"""
+import os
+
+# CPUs the process may use, read at import - before any thread has narrowed its
+# own mask. A thread inherits its creator's mask, so checking against the
+# calling thread's mask would reject CPUs another thread was moved off
+if hasattr(os, 'sched_getaffinity'):
+    PROCESS_CPUS = frozenset(os.sched_getaffinity(0))
+else:
+    PROCESS_CPUS = frozenset()
+
+
+def pin_current_thread(cpus, name="thread"):
+    """
+    Pin the calling OS thread (and threads it creates later) to a set of CPUs
+    No-op where sched_setaffinity isn't available; warns if it can't be done
+
+    Args:
+        cpus: Iterable of CPU numbers (None/empty = leave the thread alone)
+        name: What is being pinned, for warnings
+
+    Returns:
+        bool: True if the thread was pinned
+    """
+    if not cpus or not hasattr(os, 'sched_setaffinity'):
+        return False
+    allowed = set(cpus) & PROCESS_CPUS
+    if not allowed:
+        print(f"⚠️  Could not pin {name}: none of CPUs {sorted(cpus)} are available "
+              f"(process CPUs {sorted(PROCESS_CPUS)})")
+        return False
+    try:
+        os.sched_setaffinity(0, allowed)  # 0 = this thread
+    except OSError as e:
+        print(f"⚠️  Could not pin {name} to CPUs {sorted(allowed)}: {e}")
+        return False
+    return True
+
+
+def pinned(func, cpus, name="thread"):
+    """
+    Wrap func so it runs on cpus whichever OS thread calls it, restoring that
+    thread's own mask afterwards. For work handed to shared threads (e.g.
+    eventlet.tpool workers, or the main thread/event loop) where pinning the
+    thread itself would leak into everything else it runs
+
+    Args:
+        func: Function to wrap
+        cpus: Iterable of CPU numbers (None/empty = don't wrap)
+        name: What is being pinned, for warnings
+
+    Returns:
+        callable: The wrapper (func itself when there's nothing to pin)
+    """
+    if not cpus or not hasattr(os, 'sched_setaffinity'):
+        return func
+    allowed = set(cpus) & PROCESS_CPUS
+    if not allowed:
+        print(f"⚠️  Could not pin {name}: none of CPUs {sorted(cpus)} are available "
+              f"(process CPUs {sorted(PROCESS_CPUS)})")
+        return func
+
+    def run_pinned(*args, **kwargs):
+        previous = os.sched_getaffinity(0)
+        if previous == allowed:
+            return func(*args, **kwargs)
+        try:
+            os.sched_setaffinity(0, allowed)
+        except OSError:
+            return func(*args, **kwargs)  # Not allowed here - run unpinned
+        try:
+            return func(*args, **kwargs)
+        finally:
+            os.sched_setaffinity(0, previous)
+
+    return run_pinned
+
+
+# Test code
+if __name__ == "__main__":
+    print(f"Process CPUs: {sorted(PROCESS_CPUS)}")
+    last_cpu = max(PROCESS_CPUS, default=0)
+    print(f"Pinned call sees: {sorted(pinned(os.sched_getaffinity, {last_cpu})(0))}")
+    if pin_current_thread({last_cpu}, "test thread"):
+        print(f"Pinned to CPU {last_cpu}: {sorted(os.sched_getaffinity(0))}")
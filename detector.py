@@ -2,39 +2,688 @@
 YOLOv8 Human Detection Module (Optimized for Raspberry Pi)
 Handles video capture and human detection with bounding boxes
 """
+import os
+import glob
 import cv2
 import numpy as np
+import torch
+import torchvision
 from ultralytics import YOLO
+import threading
 import time
+from collections import deque
 import config
+from cpu_affinity import pinned
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    USE_TURBOJPEG = True
+except ImportError:
+    USE_TURBOJPEG = False
+
+# OpenCL (T-API) only when asked for - probing the runtime isn't free, and without a
+# driver OpenCV would just copy UMats back and forth on the CPU
+USE_UMAT = bool(config.USE_OPENCL) and cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(USE_UMAT)
+
+TEXT_SPRITE_CACHE_SIZE = 256  # Whole-string overlay masks kept by draw_text()
+
+
+def export_openvino_model(model_name, int8=False):
+    """
+    Export a PyTorch YOLO model to OpenVINO IR (only if not already exported)
+    
+    Args:
+        model_name: Path to the .pt model (e.g. yolov8n.pt)
+        int8: Export the INT8 quantized IR instead of FP16
+        
+    Returns:
+        str: Path to the OpenVINO model directory
+    """
+    base_name = os.path.splitext(model_name)[0]
+    suffix = '_int8_openvino_model' if int8 else '_openvino_model'
+    openvino_path = base_name + suffix
+    
+    if os.path.isdir(openvino_path):
+        print(f"✓ Found OpenVINO model: {openvino_path}")
+        return openvino_path
+    
+    print(f"Exporting {model_name} to OpenVINO ({'INT8' if int8 else 'FP16'})...")
+    exported_path = YOLO(model_name).export(
+        format='openvino',
+        imgsz=config.IMGSZ,
+        half=not int8,
+        int8=int8
+    )
+    print(f"✓ OpenVINO model exported: {exported_path}")
+    return str(exported_path).rstrip(os.sep)
+
+
+def export_ncnn_model(model_name):
+    """
+    Export a PyTorch YOLO model to NCNN (only if not already exported)
+    NCNN runs fused graphs on hand-tuned ARM NEON kernels
+    
+    Args:
+        model_name: Path to the .pt model (e.g. yolov8n.pt)
+        
+    Returns:
+        str: Path to the NCNN model directory
+    """
+    ncnn_path = os.path.splitext(model_name)[0] + '_ncnn_model'
+    
+    if os.path.isdir(ncnn_path):
+        print(f"✓ Found NCNN model: {ncnn_path}")
+        return ncnn_path
+    
+    print(f"Exporting {model_name} to NCNN (FP16)...")
+    exported_path = YOLO(model_name).export(format='ncnn', imgsz=config.IMGSZ, half=True)
+    print(f"✓ NCNN model exported: {exported_path}")
+    return str(exported_path).rstrip(os.sep)
+
+
+def export_onnx_model(model_name):
+    """
+    Export a PyTorch YOLO model to a simplified, fixed-shape ONNX graph (only if not already exported)
+    
+    Args:
+        model_name: Path to the .pt model (e.g. yolov8n.pt)
+        
+    Returns:
+        str: Path to the .onnx file
+    """
+    onnx_path = os.path.splitext(model_name)[0] + '.onnx'
+    
+    if os.path.isfile(onnx_path):
+        print(f"✓ Found ONNX model: {onnx_path}")
+        return onnx_path
+    
+    print(f"Exporting {model_name} to ONNX...")
+    exported_path = YOLO(model_name).export(format='onnx', imgsz=config.IMGSZ, opset=13,
+                                            simplify=True, dynamic=False)
+    print(f"✓ ONNX model exported: {exported_path}")
+    return str(exported_path)
+
+
+def trace_torchscript_model(model_name, net, imgsz):
+    """
+    Trace the fused PyTorch network to a frozen TorchScript graph (only if not already traced)
+    The Detect head bakes its anchors in for one input size, so each size gets its own file
+    
+    Args:
+        model_name: Path to the .pt model (e.g. yolov8n.pt)
+        net: Fused nn.Module in eval mode (YOLO(...).model)
+        imgsz: Square input size to trace at
+        
+    Returns:
+        torch.jit.ScriptModule: Traced network, called like net
+    """
+    script_path = f"{os.path.splitext(model_name)[0]}_imgsz{imgsz}.torchscript"
+    
+    if os.path.isfile(script_path):
+        print(f"✓ Found TorchScript model: {script_path}")
+        return torch.jit.load(script_path, map_location='cpu').eval()
+    
+    print(f"Tracing {model_name} to TorchScript ({imgsz}x{imgsz})...")
+    with torch.no_grad():
+        traced = torch.jit.trace(net, torch.zeros(1, 3, imgsz, imgsz), strict=False, check_trace=False)
+        traced = torch.jit.freeze(traced.eval())  # Fold weights/constants into the graph
+    traced.save(script_path)
+    print(f"✓ TorchScript model saved: {script_path}")
+    return traced
+
+
+class Letterbox:
+    """
+    Fixed-shape letterbox + NCHW conversion for YOLO input
+    The affine transform and output buffers are computed once per frame size,
+    so each frame costs one warpAffine and one NumPy pass with no temporaries
+    """
+    
+    def __init__(self, frame_size, imgsz=config.IMGSZ, use_umat=USE_UMAT):
+        """
+        Args:
+            frame_size: Camera frame size as (width, height)
+            imgsz: Square model input size
+            use_umat: Run the warp on the GPU through cv2.UMat (OpenCL)
+        """
+        width, height = frame_size
+        self.frame_size = frame_size
+        self.imgsz = imgsz
+        self.use_umat = use_umat
+        self.scale = min(imgsz / width, imgsz / height)
+        new_w, new_h = int(round(width * self.scale)), int(round(height * self.scale))
+        self.pad = ((imgsz - new_w) // 2, (imgsz - new_h) // 2)
+        
+        # Scale + translate into the padded square in a single affine warp
+        self.matrix = np.array([[self.scale, 0, self.pad[0]],
+                                [0, self.scale, self.pad[1]]], dtype=np.float32)
+        self._scratch = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+        self.tensor = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+    
+    def __call__(self, frame):
+        """
+        Letterbox a BGR frame into the preallocated input tensor
+        
+        Returns:
+            numpy array: (1, 3, imgsz, imgsz) float32 in [0, 1] - reused on the next call
+        """
+        if self.use_umat:
+            # Warp on the GPU; only the small imgsz x imgsz result comes back
+            scratch = cv2.warpAffine(cv2.UMat(frame), self.matrix, (self.imgsz, self.imgsz),
+                                     flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                                     borderValue=(114, 114, 114)).get()
+        else:
+            scratch = cv2.warpAffine(frame, self.matrix, (self.imgsz, self.imgsz), dst=self._scratch,
+                                     flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                                     borderValue=(114, 114, 114))
+        
+        # BGR -> RGB, HWC -> NCHW and 0-255 -> 0-1 in one pass
+        np.multiply(scratch[:, :, ::-1].transpose(2, 0, 1), np.float32(1 / 255.0),
+                    out=self.tensor[0])
+        return self.tensor
+
+
+def decode_yolo(output, scale, pad, frame_shape, conf_threshold, class_id):
+    """
+    Decode raw YOLOv8 output for one class, apply NMS and undo the letterbox
+    
+    Args:
+        output: (4 + classes, anchors) array for one image
+        scale, pad: From the Letterbox used for the input
+        frame_shape: Original frame shape (boxes are clipped to it)
+        conf_threshold: Confidence threshold
+        class_id: COCO class to keep (0 = person)
+    
+    Returns:
+        tuple: (boxes (N,4) int [x1, y1, x2, y2], confs (N,) float32)
+    """
+    scores = output[4 + class_id]
+    keep = scores > conf_threshold
+    if not keep.any():
+        return np.empty((0, 4), dtype=int), np.empty(0, dtype=np.float32)
+    
+    cx, cy, w, h = output[:4, keep]
+    scores = np.ascontiguousarray(scores[keep], dtype=np.float32)
+    boxes = np.empty((len(scores), 4), dtype=np.float32)
+    boxes[:, 0] = (cx - w / 2 - pad[0]) / scale
+    boxes[:, 1] = (cy - h / 2 - pad[1]) / scale
+    boxes[:, 2] = (cx + w / 2 - pad[0]) / scale
+    boxes[:, 3] = (cy + h / 2 - pad[1]) / scale
+    
+    # torchvision's NMS is a C++ op on zero-copy views (no Python lists, GIL released)
+    indices = torchvision.ops.nms(torch.from_numpy(boxes), torch.from_numpy(scores),
+                                  config.IOU_THRESHOLD).numpy()
+    boxes = boxes[indices]
+    scores = scores[indices]
+    
+    height, width = frame_shape[:2]
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width - 1)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height - 1)
+    return boxes.astype(int), scores
+
+
+class AsyncOpenVINOInference:
+    """
+    Runs an exported YOLOv8 OpenVINO IR with AsyncInferQueue
+    Inference of frame N overlaps with drawing/encoding of frame N-1
+    """
+    
+    def __init__(self, model_dir, device='intel:cpu', conf_threshold=0.4, class_id=0,
+                 imgsz=config.IMGSZ, num_requests=2):
+        """
+        Args:
+            model_dir: Directory of the exported *_openvino_model
+            device: 'intel:cpu', 'intel:gpu' or 'intel:npu'
+            conf_threshold: Confidence threshold for detections
+            class_id: COCO class to keep (0 = person)
+            imgsz: Model input size the IR was exported with
+            num_requests: Number of in-flight inference requests
+        """
+        import openvino as ov
+        
+        xml_files = glob.glob(os.path.join(model_dir, '*.xml'))
+        if not xml_files:
+            raise RuntimeError(f"No OpenVINO .xml model found in {model_dir}")
+        
+        core = ov.Core()
+        core.set_property({'CACHE_DIR': config.OPENVINO_CACHE_DIR})  # Restarts skip recompilation
+        ov_device = device.split(':')[-1].upper()
+        hint = 'LATENCY' if num_requests == 1 else 'THROUGHPUT'
+        compiled_model = core.compile_model(xml_files[0], ov_device, {'PERFORMANCE_HINT': hint})
+        
+        self.queue = ov.AsyncInferQueue(compiled_model, num_requests)
+        self.queue.set_callback(self._on_done)
+        self.conf_threshold = conf_threshold
+        self.class_id = class_id
+        self.imgsz = imgsz
+        self._letterbox = None
+        self.submitted = 0
+        self.delivered = 0
+        # Filled from OpenVINO's own threads - deque append/pop are atomic,
+        # so no lock is needed (and none that green-thread patching could break)
+        self._completed = deque(maxlen=1)
+        
+        print(f"✓ OpenVINO async inference on {ov_device} ({num_requests} requests)")
+    
+    def submit(self, frame, frame_index=0, captured_ns=0):
+        """
+        Start inference on a frame without waiting for the result
+        
+        Args:
+            frame: Camera frame
+            frame_index: Caller's frame number, handed back with the result
+            captured_ns: Frame capture time (time.monotonic_ns()), handed back too
+        
+        Returns:
+            bool: True if submitted, False if all requests are busy (frame dropped)
+        """
+        if not self.queue.is_ready():
+            return False
+        
+        height, width = frame.shape[:2]
+        if self._letterbox is None or self._letterbox.frame_size != (width, height):
+            self._letterbox = Letterbox((width, height), self.imgsz)
+        letterbox = self._letterbox
+        
+        # start_async copies the input, so the letterbox buffer can be reused
+        tensor = letterbox(frame)
+        self.submitted += 1
+        ctx = {'seq': self.submitted, 'frame': frame, 'frame_index': frame_index,
+               'captured_ns': captured_ns, 'scale': letterbox.scale, 'pad': letterbox.pad}
+        self.queue.start_async({0: tensor}, ctx)
+        return True
+    
+    def poll(self):
+        """
+        Get the newest completed inference (if any)
+        
+        Returns:
+            dict with 'frame_index', 'captured_ns', 'boxes' (N,4 int) and 'confs' (N,), or None
+        """
+        try:
+            ctx = self._completed.pop()
+        except IndexError:
+            return None
+        
+        # A slower request may finish after a newer one - never go backwards
+        if ctx['seq'] < self.delivered:
+            return None
+        self.delivered = ctx['seq']
+        return ctx
+    
+    def _on_done(self, request, ctx):
+        """AsyncInferQueue callback - decode boxes and keep the newest result"""
+        output = request.get_output_tensor(0).data[0]  # (4 + classes, anchors)
+        ctx['boxes'], ctx['confs'] = decode_yolo(output, ctx['scale'], ctx['pad'], ctx['frame'].shape,
+                                                 self.conf_threshold, self.class_id)
+        self._completed.append(ctx)
+    
+    def warmup(self):
+        """Run one blocking inference on a blank input so the first real frame is fast"""
+        blank = np.zeros((1, 3, self.imgsz, self.imgsz), dtype=np.float32)
+        for request in self.queue:
+            request.infer({0: blank})
+    
+    def wait_all(self):
+        """Wait for all in-flight requests to finish"""
+        self.queue.wait_all()
+
+
+class OnnxRuntimeInference:
+    """
+    Runs an exported YOLOv8 ONNX model with ONNX Runtime
+    Uses the XNNPACK execution provider (NEON micro-kernels on ARM) when available
+    """
+    
+    def __init__(self, model_path, conf_threshold=0.4, class_id=0, imgsz=config.IMGSZ, threads=4):
+        """
+        Args:
+            model_path: Exported .onnx file
+            conf_threshold: Confidence threshold for detections
+            class_id: COCO class to keep (0 = person)
+            imgsz: Model input size the graph was exported with
+            threads: Inference threads
+        """
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ['CPUExecutionProvider']
+        if 'XnnpackExecutionProvider' in ort.get_available_providers():
+            # XNNPACK brings its own thread pool - keep ORT's pool from competing with it
+            providers.insert(0, ('XnnpackExecutionProvider', {'intra_op_num_threads': threads}))
+            options.intra_op_num_threads = 1
+            options.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        else:
+            options.intra_op_num_threads = threads
+        
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.conf_threshold = conf_threshold
+        self.class_id = class_id
+        self.imgsz = imgsz
+        self._letterbox = None
+        
+        print(f"✓ ONNX Runtime inference ({self.session.get_providers()[0]})")
+    
+    def infer(self, frame):
+        """
+        Run blocking inference on one frame
+        
+        Returns:
+            tuple: (boxes (N,4) int, confs (N,))
+        """
+        height, width = frame.shape[:2]
+        if self._letterbox is None or self._letterbox.frame_size != (width, height):
+            self._letterbox = Letterbox((width, height), self.imgsz)
+        letterbox = self._letterbox
+        
+        output = self.session.run(None, {self.input_name: letterbox(frame)})[0]
+        return decode_yolo(output[0], letterbox.scale, letterbox.pad, frame.shape,
+                           self.conf_threshold, self.class_id)
+
+
+class ThreadedInference(threading.Thread):
+    """
+    Runs a blocking frame -> (boxes, confs) function on a worker thread
+    Same submit()/poll() interface as AsyncOpenVINOInference: the stream keeps
+    going at camera rate while YOLO works on the newest submitted frame
+    """
+    
+    def __init__(self, infer, frame_size, blocking_call=None):
+        """
+        Args:
+            infer: Blocking function frame -> (boxes (N,4), confs (N,))
+            frame_size: Camera frame size as (width, height), used for warmup
+            blocking_call: Runs the inference call, e.g. eventlet.tpool.execute
+        """
+        super().__init__(daemon=True)
+        self.infer = infer
+        self.frame_size = frame_size
+        self.blocking_call = blocking_call or _call_directly
+        self.running = True
+        self.submitted = 0
+        self.delivered = 0
+        self._cond = threading.Condition()
+        self._pending = None  # Newest frame not yet picked up - older ones are dropped
+        self._completed = deque(maxlen=1)
+    
+    def submit(self, frame, frame_index=0, captured_ns=0, imgsz=None):
+        """
+        Hand a frame to the worker without waiting (replaces any frame still pending)
+        
+        Args:
+            frame: Camera frame
+            frame_index: Caller's frame number, handed back with the result
+            captured_ns: Frame capture time (time.monotonic_ns()), handed back too
+            imgsz: Input size passed on to infer (None = infer's own), handed back too
+        
+        Returns:
+            bool: Always True
+        """
+        self.submitted += 1
+        # Copy - the caller keeps drawing on its frame while YOLO reads this one
+        ctx = {'seq': self.submitted, 'frame': frame.copy(), 'frame_index': frame_index,
+               'captured_ns': captured_ns, 'imgsz': imgsz}
+        with self._cond:
+            self._pending = ctx
+            self._cond.notify()
+        return True
+    
+    def run(self):
+        """
+        Run inference on the newest pending frame until stopped
+        A failed inference is reported as "no people" and the worker carries on,
+        so the detector (and the tracker's person-lost timeout) never freezes
+        """
+        failures = 0
+        while True:
+            with self._cond:
+                while self._pending is None and self.running:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                ctx, self._pending = self._pending, None
+            
+            try:
+                frame = ctx.pop('frame')
+                if ctx['imgsz'] is None:
+                    ctx['boxes'], ctx['confs'] = self.blocking_call(self.infer, frame)
+                else:
+                    ctx['boxes'], ctx['confs'] = self.blocking_call(self.infer, frame, imgsz=ctx['imgsz'])
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures == 1:
+                    print(f"⚠️  Inference error (reporting no detections until it recovers): {e}")
+                ctx['boxes'] = np.empty((0, 4), dtype=np.float32)
+                ctx['confs'] = np.empty(0, dtype=np.float32)
+            self._completed.append(ctx)
+    
+    def poll(self):
+        """
+        Get the newest completed inference (if any)
+        
+        Returns:
+            dict with 'frame_index', 'captured_ns', 'imgsz', 'boxes' and 'confs', or None
+        """
+        try:
+            ctx = self._completed.pop()
+        except IndexError:
+            return None
+        if ctx['seq'] < self.delivered:
+            return None
+        self.delivered = ctx['seq']
+        return ctx
+    
+    def warmup(self):
+        """Run one blocking inference on a blank frame so the first real frame is fast"""
+        width, height = self.frame_size
+        self.infer(np.zeros((height, width, 3), dtype=np.uint8))
+    
+    def wait_all(self):
+        """Stop the worker (an in-flight inference finishes first)"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout=2)
+
+
+def _call_directly(func, *args, **kwargs):
+    """Default blocking_call - just run the function on the current thread"""
+    return func(*args, **kwargs)
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Background camera reader that keeps only the newest frame
+    Older frames are dropped so inference never works on a stale backlog
+    """
+    
+    def __init__(self, cap, mjpeg=False, blocking_call=None, turbo=None):
+        """
+        Args:
+            cap: Opened cv2.VideoCapture
+            mjpeg: Camera delivers raw MJPEG buffers (CAP_PROP_CONVERT_RGB=0)
+            blocking_call: Runs blocking OpenCV calls, e.g. eventlet.tpool.execute
+            turbo: Optional TurboJPEG instance used to decode the MJPEG buffers
+        """
+        super().__init__(daemon=True)
+        self.cap = cap
+        # Own core for capture so it never waits behind inference threads. Pinned
+        # per call: under eventlet cap.read runs on a shared tpool thread
+        self._read = pinned(cap.read, config.CAPTURE_CPUS, "camera capture")
+        self.mjpeg = mjpeg
+        self.turbo = turbo
+        self.blocking_call = blocking_call or _call_directly
+        self.running = True
+        self.lock = threading.Lock()
+        self.new_frame = threading.Event()
+        self._latest = (False, None, None, 0)
+    
+    def run(self):
+        """Read frames as fast as the camera delivers them"""
+        while self.running:
+            success, frame = self.blocking_call(self._read)
+            captured_ns = time.monotonic_ns()
+            jpeg = None
+            
+            # Raw MJPEG from the camera: keep the encoded bytes, decode for detection
+            if success and self.mjpeg and frame.ndim < 3:
+                jpeg = frame.tobytes()
+                frame = self._decode(frame, jpeg)
+                success = frame is not None
+            
+            with self.lock:
+                self._latest = (success, frame, jpeg, captured_ns)
+            self.new_frame.set()
+            if not success:
+                time.sleep(0.01)  # Avoid spinning on a disconnected camera
+    
+    def _decode(self, buf, jpeg):
+        """Decode an MJPEG buffer to BGR (libjpeg-turbo directly when available)"""
+        if self.turbo is not None:
+            try:
+                return self.turbo.decode(jpeg, pixel_format=TJPF_BGR)
+            except (OSError, ValueError):
+                pass  # Corrupt/partial buffer - let OpenCV try
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    
+    def latest(self, timeout=1.0):
+        """
+        Get the newest frame, waiting for one newer than the last call
+        
+        Returns:
+            tuple: (success, frame, jpeg, captured_ns) - jpeg is the camera's own
+                   encoding or None, captured_ns is time.monotonic_ns() at capture
+        """
+        self.new_frame.wait(timeout)
+        self.new_frame.clear()
+        with self.lock:
+            return self._latest
+    
+    def stop(self):
+        """Stop the capture thread"""
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=1)
 
 
 class HumanDetector:
-    def __init__(self, model_name='yolov8n.pt', conf_threshold=0.4, camera_index=0, resolution=(320, 240)):
+    def __init__(self, model_name='yolov8n.pt', conf_threshold=0.4, camera_index=0, resolution=(320, 240),
+                 device='cpu', blocking_call=None):
         """
         Initialize YOLOv8 human detector
         
         Args:
             model_name: YOLOv8 model to use (default: yolov8n.pt - nano, fastest)
+                        Can also be an exported *_openvino_model/ directory or .onnx file
             conf_threshold: Confidence threshold for detections (default: 0.4)
             camera_index: Camera device index (default: 0)
             resolution: Camera resolution as (width, height) tuple
+            device: Inference device (default: 'cpu', use 'intel:cpu' etc. for OpenVINO)
+            blocking_call: Runs blocking camera/inference calls off the event loop
+                           (e.g. eventlet.tpool.execute), default runs them directly
         """
+        # OpenMP doesn't oversubscribe (inference is pinned off the capture core below)
+        torch.set_num_threads(config.INFERENCE_THREADS)
+        cv2.setNumThreads(1)
+        
         print(f"Loading YOLOv8 model: {model_name}")
-        self.model = YOLO(model_name)
+        onnx = model_name.endswith('.onnx')
+        self.model = None if onnx else YOLO(model_name)  # ONNX runs on our own session
+        self.device = device
+        self.blocking_call = blocking_call or _call_directly
+        
+        # Optimize for Raspberry Pi (exported models are already fused)
+        if model_name.endswith('.pt'):
+            self.model.fuse()  # Fuse layers for faster inference
+        
+        # PyTorch model: run the network directly on a preallocated letterbox
+        # tensor, skipping Ultralytics' per-call preprocessing and Results objects
+        # (ONNX models always run this way, on ONNX Runtime)
+        self._sync_infer = None  # frame -> (boxes, confs)
+        self._direct_model = None
+        self._direct_models = {}  # imgsz -> network (TorchScript traces are size-specific)
+        self._letterboxes = {}  # imgsz -> (Letterbox, torch view of its tensor)
+        if model_name.endswith('.pt') and config.YOLO_DIRECT_INFERENCE:
+            self._direct_model = self.model.model.eval()
+            self._sync_infer = self._infer_direct
+        elif onnx:
+            self._sync_infer = OnnxRuntimeInference(
+                model_name, conf_threshold=conf_threshold, class_id=0,
+                imgsz=config.IMGSZ, threads=config.ONNX_THREADS
+            ).infer
+        else:
+            self._sync_infer = self._infer_predictor
+        # Only the inference call runs on INFERENCE_CPUS (and torch's OpenMP pool,
+        # created from inside it, inherits that) - the main thread/event loop and
+        # other threads keep their own CPUs
+        self._sync_infer = pinned(self._sync_infer, config.INFERENCE_CPUS, "inference")
+        
+        # Empty scenes run at IDLE_IMGSZ (PyTorch only - exported models have a fixed input)
+        self.imgsz = config.IMGSZ
+        self._dynamic_imgsz = model_name.endswith('.pt') and bool(config.IDLE_IMGSZ)
+        self._miss_streak = 0
         
-        # Optimize for Raspberry Pi
-        self.model.fuse()  # Fuse layers for faster inference
+        # Trace (or load the cached trace of) the direct network for every size it will see
+        if self._direct_model is not None:
+            sizes = {config.IMGSZ, config.IDLE_IMGSZ} if self._dynamic_imgsz else {config.IMGSZ}
+            for size in sizes:
+                self._direct_models[size] = (
+                    trace_torchscript_model(model_name, self._direct_model, size)
+                    if config.YOLO_TORCHSCRIPT else self._direct_model
+                )
         
         self.conf_threshold = conf_threshold
         self.camera_index = camera_index
         self.resolution = resolution
         self.frame_count = 0
         self.last_human_count = 0
-        self.last_results = None
+        self._text_sprites = {}  # Pre-rendered overlay text masks
+        self._glyphs = {}  # Pre-rendered single characters for changing text (FPS, labels)
+        self._prev_small = None  # Motion gate thumbnail from the last YOLO frame
+        self.draw_overlay = config.STREAM_OVERLAY
+        
+        # libjpeg-turbo encoder returns bytes directly (no intermediate NumPy buffer)
+        self._jpeg = None
+        if USE_TURBOJPEG:
+            try:
+                self._jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️  TurboJPEG unavailable ({e}), using cv2.imencode")
+        
+        # COCO dataset class ID for person is 0
+        self.person_class_id = 0
+        
+        # Last detections as plain arrays, propagated on skipped frames
+        self.last_boxes = np.empty((0, 4), dtype=int)
+        self.last_confs = np.empty(0, dtype=np.float32)
+        self.detected_boxes = np.empty((0, 4), dtype=np.float32)
+        self.box_velocity = np.empty((0, 4), dtype=np.float32)
+        self.detected_frame = 0
+        
+        # OpenVINO async pipeline (results arrive one frame behind)
+        self.async_infer = None
+        if config.OPENVINO_ASYNC and device.startswith('intel:') and os.path.isdir(model_name):
+            try:
+                self.async_infer = AsyncOpenVINOInference(
+                    model_name, device=device, conf_threshold=conf_threshold,
+                    class_id=self.person_class_id, num_requests=config.OPENVINO_NUM_REQUESTS
+                )
+            except Exception as e:
+                print(f"⚠️  OpenVINO async init failed: {e}, using synchronous inference")
+        
+        # Other backends: infer on a worker thread so the stream never waits on YOLO
+        if self.async_infer is None and config.THREADED_INFERENCE:
+            self.async_infer = ThreadedInference(self._sync_infer, resolution, self.blocking_call)
+            self.async_infer.start()
         
         # Initialize camera - try to find working camera
         self.cap = None
+        self.grabber = None
         cameras_to_try = [camera_index, 0, 1, 2, '/dev/video0', '/dev/video1']
         
         for cam_id in cameras_to_try:
@@ -65,19 +714,38 @@ class HumanDetector:
                 "  3. Run 'v4l2-ctl --list-devices' for more info"
             )
         
-        # Set camera properties
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        # Capture runs in its own thread so detection always gets the newest frame
+        self.last_jpeg = None
+        self.last_frame_ns = 0  # time.monotonic_ns() when the last read frame was captured
+        self.detections_ns = 0  # ...and when the frame the current boxes came from was captured
+        mjpeg = self._start_capture()
+        if mjpeg:
+            print("  Camera MJPEG passthrough enabled")
         
         print(f"Camera initialized: {resolution[0]}x{resolution[1]}")
         print(f"✓ Model loaded (optimized for Pi)")
         print(f"  Image size: {config.IMGSZ}x{config.IMGSZ}")
         print(f"  Processing every {config.PROCESS_EVERY_N_FRAMES} frames")
+        if USE_UMAT:
+            print("  OpenCL letterbox enabled")
+        elif config.USE_OPENCL:
+            print("⚠️  USE_OPENCL set but no OpenCL device found, letterboxing on the CPU")
         
-        # COCO dataset class ID for person is 0
-        self.person_class_id = 0
-        
+    def warmup(self):
+        """
+        Run the model once on a blank frame
+        The first inference is much slower than steady state (graph compile,
+        memory allocation), so pay that cost at startup instead of on the stream
+        """
+        print("Warming up model...")
+        start = time.time()
+        blank = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
+        if self.async_infer is not None:
+            self.async_infer.warmup()
+        else:
+            self._sync_infer(blank)
+        print(f"✓ Model warm ({time.time() - start:.2f}s)")
+    
     def detect_humans(self, frame):
         """
         Detect humans in a frame (optimized with frame skipping)
@@ -90,85 +758,313 @@ class HumanDetector:
         """
         self.frame_count += 1
         
+        # Pick up a finished background inference as soon as it's ready (skipped frames too)
+        if self.async_infer is not None:
+            self._collect_async(frame)
+        
         # Skip frames for better performance
         if self.frame_count % config.PROCESS_EVERY_N_FRAMES != 0:
-            # Use cached results
-            if self.last_results is not None:
-                return self._draw_cached_results(frame), self.last_human_count
-            return frame, 0
-        
-        # Run YOLOv8 inference with optimization
-        results = self.model(
-            frame, 
-            conf=self.conf_threshold, 
-            verbose=False,
-            imgsz=config.IMGSZ,  # Smaller size = much faster
-            iou=config.IOU_THRESHOLD,
-            classes=[self.person_class_id],  # Only detect persons
-            device='cpu',
-            half=False  # Don't use FP16 on CPU
-        )
-        
-        # Store results for caching
-        self.last_results = results
-        
-        # Count humans
-        human_count = 0
-        
-        # Draw bounding boxes
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get class ID
-                    class_id = int(box.cls[0])
-                    
-                    # Check if detection is a person
-                    if class_id == self.person_class_id:
-                        human_count += 1
-                        
-                        # Get bounding box coordinates
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                        
-                        # Get confidence
-                        confidence = float(box.conf[0])
-                        
-                        # Draw bounding box
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        
-                        # Draw label
-                        label = f"Person {confidence:.2f}"
-                        label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
-                        cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
-                                    (x1 + label_size[0], y1), (0, 255, 0), -1)
-                        cv2.putText(frame, label, (x1, y1 - 5), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
-        
-        self.last_human_count = human_count
-        return frame, human_count
-    
-    def _draw_cached_results(self, frame):
-        """Draw last detection results on a new frame"""
-        if self.last_results is None:
+            if self.last_human_count == 0:
+                return frame, 0  # Nothing to propagate or draw (the common case)
+            # Move the last boxes along with the person instead of re-running YOLO
+            self.update_trackers(frame)
+            return self._draw_boxes(frame, self.last_boxes, self.last_confs), self.last_human_count
+        
+        # Nothing moved since the last YOLO run - the last boxes are still right
+        if config.MOTION_GATE and self._scene_static(frame):
+            self.detections_ns = self.last_frame_ns  # ...and confirmed for this frame
+            return self._draw_boxes(frame, self.last_boxes, self.last_confs), self.last_human_count
+        
+        if self.async_infer is not None:
+            return self._detect_humans_async(frame)
+        
+        boxes, confs = self.blocking_call(self._sync_infer, frame)
+        if len(boxes) > 0 and self.imgsz != config.IMGSZ:
+            # Confirm a hit from the idle size at full size (small inputs give more false positives)
+            self.imgsz = config.IMGSZ
+            boxes, confs = self.blocking_call(self._sync_infer, frame)
+        self._set_detections(boxes, confs)
+        self.last_human_count = len(self.last_boxes)
+        self._track_idle()
+        return self._draw_boxes(frame, self.last_boxes, self.last_confs), self.last_human_count
+    
+    def _infer_predictor(self, frame, imgsz=None):
+        """
+        Run the Ultralytics predictor (exported OpenVINO/NCNN models, or YOLO_DIRECT_INFERENCE off)
+        
+        Args:
+            frame: BGR frame
+            imgsz: Input size (default: self.imgsz)
+        
+        Returns:
+            tuple: (boxes (N,4), confs (N,))
+        """
+        with torch.inference_mode():  # No autograd/version-counter bookkeeping
+            results = self.model(
+                frame, 
+                conf=self.conf_threshold, 
+                verbose=False,
+                imgsz=imgsz or self.imgsz,  # Smaller size = much faster
+                iou=config.IOU_THRESHOLD,
+                classes=[self.person_class_id],  # Only detect persons
+                device=self.device,
+                half=False  # Don't use FP16 on CPU (OpenVINO IR carries its own precision)
+            )
+        
+        # boxes.data is (N, 6) = x1, y1, x2, y2, conf, cls: filter on the tensor,
+        # then one transfer for everything (no per-box or per-column round-trips)
+        boxes = results[0].boxes if results else None
+        if boxes is None or len(boxes) == 0:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+        data = boxes.data
+        data = data[data[:, 5].to(torch.int32) == self.person_class_id].cpu().numpy()
+        return data[:, :4], data[:, 4]
+    
+    
+    def _track_idle(self):
+        """Drop to IDLE_IMGSZ after IDLE_IMGSZ_AFTER empty runs, back to IMGSZ on any hit"""
+        if not self._dynamic_imgsz:
+            return
+        if self.last_human_count > 0:
+            self._miss_streak = 0
+            self.imgsz = config.IMGSZ
+            return
+        self._miss_streak += 1
+        if self._miss_streak >= config.IDLE_IMGSZ_AFTER:
+            self.imgsz = config.IDLE_IMGSZ
+    
+    def _scene_static(self, frame):
+        """
+        Cheap motion check on a 32x32 grayscale thumbnail (~1 KB vs a full YOLO run)
+        Compared against the thumbnail from the last frame sent to YOLO, so slow
+        drift still adds up, and YOLO runs at least every MOTION_GATE_MAX_FRAMES
+        """
+        small = cv2.cvtColor(cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2GRAY)
+        if (self._prev_small is not None
+                and self.frame_count - self.detected_frame < config.MOTION_GATE_MAX_FRAMES
+                and cv2.absdiff(small, self._prev_small).mean() < config.MOTION_GATE_THRESHOLD):
+            return True
+        self._prev_small = small
+        return False
+    
+    def _infer_direct(self, frame, imgsz=None):
+        """
+        Run the fused PyTorch network on one frame without the Ultralytics predictor
+        
+        Args:
+            frame: BGR frame
+            imgsz: Input size (default: self.imgsz)
+        
+        Returns:
+            tuple: (boxes (N,4) int, confs (N,))
+        """
+        height, width = frame.shape[:2]
+        imgsz = imgsz or self.imgsz
+        cached = self._letterboxes.get(imgsz)
+        if cached is None or cached[0].frame_size != (width, height):
+            letterbox = Letterbox((width, height), imgsz)
+            cached = self._letterboxes[imgsz] = (letterbox, torch.from_numpy(letterbox.tensor))  # Shares memory
+        letterbox, torch_input = cached
+        letterbox(frame)  # Fills torch_input in place
+        
+        with torch.inference_mode():
+            output = self._direct_models[imgsz](torch_input)
+        if isinstance(output, (list, tuple)):
+            output = output[0]  # (1, 4 + classes, anchors)
+        
+        return decode_yolo(output[0].numpy(), letterbox.scale, letterbox.pad, frame.shape,
+                           self.conf_threshold, self.person_class_id)
+    
+    def _detect_humans_async(self, frame):
+        """
+        Submit frame for background inference and draw the latest boxes on it
+        The result is applied by _collect_async() on a later frame
+        
+        Returns:
+            tuple: (processed_frame, detection_count) - always the current frame
+        """
+        if self._dynamic_imgsz:
+            # Tag the size so the result can be told apart from a full-size one
+            self.async_infer.submit(frame, self.frame_count, self.last_frame_ns, imgsz=self.imgsz)
+        else:
+            self.async_infer.submit(frame, self.frame_count, self.last_frame_ns)
+        return self._draw_boxes(frame, self.last_boxes, self.last_confs), self.last_human_count
+    
+    def _collect_async(self, frame):
+        """
+        Apply the newest finished background inference, if any
+        Its boxes belong to the older frame that was submitted, so they're moved
+        forward to the current frame like propagated boxes
+        A hit from the idle size isn't acted on: the current frame is resubmitted
+        at full size and only that result reaches the tracker
+        """
+        done = self.async_infer.poll()
+        if done is None:
+            return
+        if len(done['boxes']) > 0 and done.get('imgsz') not in (None, config.IMGSZ):
+            # Confirm at full size first (small inputs give more false positives)
+            self.imgsz = config.IMGSZ
+            self._miss_streak = 0
+            self.async_infer.submit(frame, self.frame_count, self.last_frame_ns, imgsz=self.imgsz)
+            return
+        self._set_detections(done['boxes'], done['confs'], done['frame_index'], done['captured_ns'])
+        self.update_trackers(frame)
+        self.last_human_count = len(self.last_boxes)
+        self._track_idle()
+    
+    def _draw_boxes(self, frame, boxes, confs):
+        """Draw person boxes from (N,4) coordinate and (N,) confidence arrays"""
+        if len(boxes) == 0:
+            return frame
+        label_h = self._glyph('P', 0.4, 1)[1] - 1  # Cap height (baseline_y minus the pad), same for every label
+        # Per-box loop: bind the lookups once (LOAD_FAST instead of global/attribute lookups)
+        rectangle = cv2.rectangle
+        text_width = self.text_width
+        draw_glyphs = self.draw_glyphs
+        green, black = (0, 255, 0), (0, 0, 0)
+        for (x1, y1, x2, y2), confidence in zip(boxes.tolist(), confs.tolist()):
+            rectangle(frame, (x1, y1), (x2, y2), green, 2)
+            label = f"Person {confidence:.2f}"
+            rectangle(frame, (x1, y1 - label_h - 10), 
+                      (x1 + text_width(label, 0.4, 1), y1), green, -1)
+            draw_glyphs(frame, label, (x1, y1 - 5), 0.4, black, 1)
+        return frame
+    
+    def _set_detections(self, boxes, confs, frame_index=None, captured_ns=None):
+        """
+        Store new YOLO boxes and estimate their motion from the previous detection
+        
+        Args:
+            boxes: (N,4) array of [x1, y1, x2, y2]
+            confs: (N,) array of confidences
+            frame_index: frame_count of the frame YOLO ran on (default: the current one)
+            captured_ns: Capture time of that frame (default: the current one's)
+        """
+        if frame_index is None:
+            frame_index = self.frame_count
+        self.detections_ns = self.last_frame_ns if captured_ns is None else captured_ns
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        velocity = np.zeros_like(boxes)
+        
+        if len(boxes) > 0 and len(self.detected_boxes) > 0:
+            frames_elapsed = max(frame_index - self.detected_frame, 1)
+            centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+            prev_centers = (self.detected_boxes[:, :2] + self.detected_boxes[:, 2:]) / 2
+            
+            # Match each box to the nearest previous box (if it's close enough)
+            dists = np.linalg.norm(centers[:, None, :] - prev_centers[None, :, :], axis=2)
+            nearest = dists.argmin(axis=1)
+            widths = boxes[:, 2] - boxes[:, 0]
+            matched = dists[np.arange(len(boxes)), nearest] < widths
+            velocity[matched] = (boxes[matched] - self.detected_boxes[nearest[matched]]) / frames_elapsed
+        
+        self.detected_boxes = boxes
+        self.box_velocity = velocity
+        self.detected_frame = frame_index
+        self.last_boxes = boxes.astype(int)
+        self.last_confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+    
+    def update_trackers(self, frame):
+        """Propagate the last detected boxes to the current frame at constant velocity"""
+        if len(self.detected_boxes) == 0:
+            return
+        
+        frames_elapsed = self.frame_count - self.detected_frame
+        boxes = self.detected_boxes + self.box_velocity * frames_elapsed
+        
+        height, width = frame.shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width - 1)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height - 1)
+        self.last_boxes = boxes.astype(int)
+    
+    def get_detections(self):
+        """
+        Get the current person boxes (detected or propagated)
+        
+        Returns:
+            numpy array: (N,4) int array of [x1, y1, x2, y2]
+        """
+        return self.last_boxes
+    
+    def draw_text(self, frame, text, org, font_scale, color, thickness):
+        """
+        Draw static text from a cached pre-rendered mask (same arguments as cv2.putText)
+        Glyphs are rasterized once per unique string instead of every frame
+        """
+        key = (text, font_scale, thickness)
+        sprite = self._text_sprites.get(key)
+        if sprite is None:
+            (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+            pad = thickness
+            canvas = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad), dtype=np.uint8)
+            cv2.putText(canvas, text, (pad, text_h + pad), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 255, thickness)
+            sprite = (canvas > 0, text_h + pad, pad)
+            if len(self._text_sprites) >= TEXT_SPRITE_CACHE_SIZE:
+                self._text_sprites.clear()  # Changing text belongs in draw_glyphs - don't grow forever
+            self._text_sprites[key] = sprite
+        
+        mask, baseline_y, pad = sprite
+        x = org[0] - pad
+        y = org[1] - baseline_y
+        mask_h, mask_w = mask.shape
+        if x < 0 or y < 0 or x + mask_w > frame.shape[1] or y + mask_h > frame.shape[0]:
+            # Clipped at the frame edge - let OpenCV handle it
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness)
             return frame
         
-        for result in self.last_results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    class_id = int(box.cls[0])
-                    if class_id == self.person_class_id:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-                        confidence = float(box.conf[0])
-                        
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        label = f"Person {confidence:.2f}"
-                        label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
-                        cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
-                                    (x1 + label_size[0], y1), (0, 255, 0), -1)
-                        cv2.putText(frame, label, (x1, y1 - 5), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+        frame[y:y + mask_h, x:x + mask_w][mask] = color
+        return frame
+    
+    def _glyph(self, char, font_scale, thickness):
+        """
+        Get a cached single-character mask
+        
+        Returns:
+            tuple: (mask, baseline_y, pad, advance)
+        """
+        key = (char, font_scale, thickness)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            (char_w, char_h), baseline = cv2.getTextSize(char, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+            pad = thickness
+            canvas = np.zeros((char_h + baseline + 2 * pad, char_w + 2 * pad), dtype=np.uint8)
+            cv2.putText(canvas, char, (pad, char_h + pad), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 255, thickness)
+            # getTextSize counts the stroke thickness once per string, not per character
+            glyph = (canvas > 0, char_h + pad, pad, char_w - thickness)
+            self._glyphs[key] = glyph
+        return glyph
+    
+    def text_width(self, text, font_scale, thickness):
+        """Width of text drawn with draw_glyphs (no getTextSize call)"""
+        glyph = self._glyph
+        return sum(glyph(char, font_scale, thickness)[3] for char in text) + thickness
+    
+    def draw_glyphs(self, frame, text, org, font_scale, color, thickness):
+        """
+        Draw changing text (numbers) from cached per-character masks (same arguments as cv2.putText)
+        Each character is rasterized once, then every frame is just a few small masked copies
+        """
+        x, y = org
+        height, width = frame.shape[:2]
+        glyph = self._glyph
+        glyphs = [glyph(char, font_scale, thickness) for char in text]
+        
+        top = y - max(glyph[1] for glyph in glyphs)
+        bottom = max(y - glyph[1] + glyph[0].shape[0] for glyph in glyphs)
+        right = x + sum(glyph[3] for glyph in glyphs) + 2 * thickness
+        if top < 0 or x - thickness < 0 or bottom > height or right > width:
+            # Clipped at the frame edge - let OpenCV handle it
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness)
+            return frame
         
+        for char, (mask, baseline_y, pad, advance) in zip(text, glyphs):
+            if char != ' ':
+                mask_h, mask_w = mask.shape
+                glyph_y = y - baseline_y
+                glyph_x = x - pad
+                frame[glyph_y:glyph_y + mask_h, glyph_x:glyph_x + mask_w][mask] = color
+            x += advance
         return frame
     
     def add_info_overlay(self, frame, human_count, distance, fps=0):
@@ -184,40 +1080,107 @@ class HumanDetector:
         Returns:
             Frame with overlay
         """
+        if not self.draw_overlay:
+            return frame  # Dashboard already shows count/FPS - skip the text work
+        
         height, width = frame.shape[:2]
         
-        # Semi-transparent overlay background
-        overlay = frame.copy()
+        # Semi-transparent background: a black box at 0.6 opacity is just the
+        # pixels scaled by 0.4, so darken that region in place (no frame copy/blend)
+        # (convertScaleAbs: one saturating SIMD pass, rounds like addWeighted did)
+        box = frame[10:61, 10:201]
+        cv2.convertScaleAbs(box, dst=box, alpha=0.4)
         
         # Top-left: Human count only (removed distance display)
         count_text = f"Humans: {human_count}"
-        cv2.rectangle(overlay, (10, 10), (200, 60), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
-        cv2.putText(frame, count_text, (20, 45), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+        self.draw_text(frame, count_text, (20, 45), 1.0, (0, 255, 0), 2)
         
         # Distance display REMOVED per user request
         _skip_distance = distance  # Use variable to avoid unused warning
         
         # Bottom-left: FPS
         if fps > 0:
-            fps_text = f"FPS: {fps:.1f}"
-            cv2.putText(frame, fps_text, (20, height - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            fps_text = f"FPS: {fps:4.1f}"  # Fixed width so the layout doesn't jump
+            self.draw_glyphs(frame, fps_text, (20, height - 20), 0.6, (255, 255, 255), 2)
         
         return frame
     
+    def encode_jpeg(self, frame, quality):
+        """
+        Encode a frame as JPEG
+        
+        Args:
+            frame: BGR frame
+            quality: JPEG quality (0-100)
+            
+        Returns:
+            bytes: JPEG data, or None if encoding failed
+        """
+        if self._jpeg is not None:
+            return self._jpeg.encode(frame, quality=quality)
+        
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ret else None
+    
     def read_frame(self):
         """
-        Read a frame from the camera
+        Read the newest frame from the camera (older frames are dropped)
+        The camera's own JPEG for this frame (if any) is kept in self.last_jpeg,
+        its capture time in self.last_frame_ns
         
         Returns:
             tuple: (success, frame)
         """
-        return self.cap.read()
+        success, frame, self.last_jpeg, self.last_frame_ns = self.grabber.latest()
+        return success, frame
+    
+    def _start_capture(self):
+        """
+        Set the camera properties and start the capture thread on self.cap
+        
+        Returns:
+            bool: True if the camera delivers raw MJPEG
+        """
+        mjpeg = False
+        if config.CAMERA_MJPEG:
+            # Ask the camera for MJPEG and keep the raw buffers so the
+            # stream can reuse the camera's JPEG instead of re-encoding
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            mjpeg = self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Don't let V4L2 queue stale frames
+        
+        self.grabber = FrameGrabber(self.cap, mjpeg=mjpeg, blocking_call=self.blocking_call,
+                                    turbo=self._jpeg)
+        self.grabber.start()
+        return mjpeg
+    
+    def reopen_camera(self):
+        """
+        Release and reopen the camera after it stopped delivering frames
+        (e.g. the USB camera was reset or replugged)
+        
+        Returns:
+            bool: True if the camera opened again
+        """
+        self.grabber.stop()
+        self.cap.release()
+        self.cap = cv2.VideoCapture(self.camera_index)
+        if not self.cap.isOpened():
+            print(f"⚠️  Could not reopen camera {self.camera_index}")
+            return False
+        self._start_capture()
+        print(f"✓ Camera {self.camera_index} reopened")
+        return True
     
     def release(self):
         """Release camera resources"""
+        if self.async_infer is not None:
+            self.async_infer.wait_all()
+        if self.grabber:
+            self.grabber.stop()
         if self.cap:
             self.cap.release()
         print("Camera released")
@@ -2,26 +2,59 @@
 L298N Motor Driver Controller
 Controls two DC motors for a robot car
 """
+import logging
+import os
+import sys
+import threading
 import time
+from cpu_affinity import pin_current_thread
 
+# Per-command output (dummy mode) - only formatted when DEBUG is enabled
+log = logging.getLogger("motors")
+
+USE_LGPIO = False
 USE_GPIOZERO = False
 USE_RPIGPIO = False
 
+# First GPIO library found wins; which one is reported when a MotorController
+# is created (importing this module has no output)
 try:
-    from gpiozero import OutputDevice, PWMOutputDevice
-    USE_GPIOZERO = True
-    print("Motors: Using gpiozero library (Raspberry Pi 5)")
+    import lgpio
+    USE_LGPIO = True
 except ImportError:
     try:
-        import RPi.GPIO as GPIO
-        USE_RPIGPIO = True
-        print("Motors: Using RPi.GPIO library")
-    except (ImportError, RuntimeError):
-        print("Motors: No GPIO library - DUMMY MODE")
+        from gpiozero import OutputDevice, PWMOutputDevice
+        USE_GPIOZERO = True
+    except ImportError:
+        try:
+            import RPi.GPIO as GPIO
+            USE_RPIGPIO = True
+        except (ImportError, RuntimeError):
+            pass
+
+# SoC hardware PWM for ENA/ENB (optional, needs ENA/ENB rewired to GPIO 12/13 or 18/19)
+try:
+    from rpi_hardware_pwm import HardwarePWM
+    HARDWARE_PWM_AVAILABLE = True
+except ImportError:
+    HARDWARE_PWM_AVAILABLE = False
+
+# lgpio direction bits for the (IN1, IN2, IN3, IN4) group
+DIR_FORWARD = 0b0101
+DIR_BACKWARD = 0b1010
+DIR_LEFT = 0b0110   # Motor A backward, motor B forward
+DIR_RIGHT = 0b1001  # Motor A forward, motor B backward
+DIR_BRAKE = 0b1111  # Both inputs high = active brake
+DIR_COAST = 0b0000  # Both inputs low = free-wheel (RPi.GPIO stop)
+DIRECTION_NAMES = {DIR_FORWARD: 'Forward', DIR_BACKWARD: 'Backward',
+                   DIR_LEFT: 'Left', DIR_RIGHT: 'Right'}
+PWM_FREQUENCY = 1000
 
 
 class MotorController:
-    def __init__(self, ena=22, in1=17, in2=27, enb=25, in3=23, in4=24):
+    def __init__(self, ena=22, in1=17, in2=27, enb=25, in3=23, in4=24,
+                 hw_pwm_channels=None, hw_pwm_chip=0, command_hz=None,
+                 writer_cpus=None, writer_priority=None):
         """
         Initialize L298N Motor Controller
         
@@ -30,6 +63,15 @@ class MotorController:
             in1, in2: Control pins for Motor A direction - Default 17, 27
             enb: Enable pin for Motor B (PWM) - Default 25
             in3, in4: Control pins for Motor B direction - Default 23, 24
+            hw_pwm_channels: (channel A, channel B) to generate ENA/ENB with the SoC's
+                             hardware PWM instead of software PWM (any backend, needs
+                             dtoverlay=pwm-2chan), None = software PWM on ena/enb
+            hw_pwm_chip: PWM chip for hw_pwm_channels (2 on Raspberry Pi 5)
+            command_hz: Apply commands from a writer thread at most this often,
+                        newest command wins (None = write the pins on every call)
+            writer_cpus: CPUs to pin the writer thread to (None = no pinning)
+            writer_priority: SCHED_FIFO priority (1-99) for the writer thread
+                             (None = normal scheduling, needs rtprio in limits.conf)
         
         Note: Updated pinout for gpiozero compatibility:
             Motor A (Left):  IN1=17, IN2=27, ENA=22 (PWM)
@@ -45,17 +87,55 @@ class MotorController:
         self.in3 = in3
         self.in4 = in4
         
-        if USE_GPIOZERO:
+        # ENA/ENB from the SoC's PWM block: jitter-free, no CPU timer or PWM thread,
+        # and independent of the GPIO library (the pins then belong to the PWM overlay)
+        self.hw_pwm = None
+        if hw_pwm_channels and (USE_LGPIO or USE_GPIOZERO or USE_RPIGPIO):
+            if HARDWARE_PWM_AVAILABLE:
+                try:
+                    self.hw_pwm = tuple(
+                        HardwarePWM(pwm_channel=channel, hz=PWM_FREQUENCY, chip=hw_pwm_chip)
+                        for channel in hw_pwm_channels
+                    )
+                    for pwm in self.hw_pwm:
+                        pwm.start(0)
+                    print(f"  Hardware PWM on channels {hw_pwm_channels}")
+                except Exception as e:
+                    print(f"⚠️  Hardware PWM unavailable ({e}), using software PWM")
+                    self.hw_pwm = None
+            else:
+                print("⚠️  rpi-hardware-pwm not installed, using software PWM")
+        
+        if USE_LGPIO:
+            try:
+                self.chip = lgpio.gpiochip_open(0)
+                # Claim the four direction pins as one group, so each direction
+                # change is a single write instead of four
+                lgpio.group_claim_output(self.chip, [in1, in2, in3, in4])
+                
+                if not self.hw_pwm:
+                    lgpio.gpio_claim_output(self.chip, ena, 0)
+                    lgpio.gpio_claim_output(self.chip, enb, 0)
+                
+                print(f"✓ Motors initialized (lgpio - Pi 5)")
+                print(f"  Motor A (Left):  IN1={in1}, IN2={in2}, ENA={ena}")
+                print(f"  Motor B (Right): IN1={in3}, IN2={in4}, ENB={enb}")
+            except Exception as e:
+                print(f"⚠️  lgpio init failed: {e}, using dummy mode")
+                self.dummy_mode = True
+        elif USE_GPIOZERO:
             try:
                 # Motor A (Left) using gpiozero
                 self.in1_a = OutputDevice(in1, active_high=True, initial_value=False)
                 self.in2_a = OutputDevice(in2, active_high=True, initial_value=False)
-                self.ena_a = PWMOutputDevice(ena, frequency=1000, initial_value=0.0)
                 
                 # Motor B (Right) using gpiozero
                 self.in1_b = OutputDevice(in3, active_high=True, initial_value=False)
                 self.in2_b = OutputDevice(in4, active_high=True, initial_value=False)
-                self.ena_b = PWMOutputDevice(enb, frequency=1000, initial_value=0.0)
+                
+                if not self.hw_pwm:
+                    self.ena_a = PWMOutputDevice(ena, frequency=1000, initial_value=0.0)
+                    self.ena_b = PWMOutputDevice(enb, frequency=1000, initial_value=0.0)
                 
                 print(f"✓ Motors initialized (gpiozero - Pi 5)")
                 print(f"  Motor A (Left):  IN1={in1}, IN2={in2}, ENA={ena}")
@@ -68,172 +148,201 @@ class MotorController:
             GPIO.setwarnings(False)
             
             # Setup motor pins
-            GPIO.setup([ena, in1, in2, enb, in3, in4], GPIO.OUT)
+            GPIO.setup([in1, in2, in3, in4] if self.hw_pwm else [ena, in1, in2, enb, in3, in4],
+                       GPIO.OUT)
+            
+            # Direction pins are written together: one list-form GPIO.output per
+            # command, with each direction's levels worked out here once
+            # (GPIO.HIGH/LOW and GPIO.output are looked up here, not per command)
+            self._pins = [in1, in2, in3, in4]
+            self._levels = {
+                bits: [GPIO.HIGH if (bits >> i) & 1 else GPIO.LOW for i in range(4)]
+                for bits in (DIR_FORWARD, DIR_BACKWARD, DIR_LEFT, DIR_RIGHT, DIR_BRAKE, DIR_COAST)
+            }
+            self._gpio_output = GPIO.output
             
             # Setup PWM for speed control (1000 Hz)
-            self.pwm_a = GPIO.PWM(ena, 1000)
-            self.pwm_b = GPIO.PWM(enb, 1000)
-            self.pwm_a.start(0)
-            self.pwm_b.start(0)
+            if not self.hw_pwm:
+                self.pwm_a = GPIO.PWM(ena, 1000)
+                self.pwm_b = GPIO.PWM(enb, 1000)
+                self.pwm_a.start(0)
+                self.pwm_b.start(0)
             
             print(f"✓ Motors initialized (RPi.GPIO)")
         else:
             self.dummy_mode = True
-            print("⚠️  Motors in DUMMY MODE")
+            print("⚠️  No GPIO library - Motors in DUMMY MODE")
+        
+        # Pick the backend once - the direction methods then make a single
+        # call with no per-command library checks
+        self._stop_bits = DIR_BRAKE
+        if self.dummy_mode:
+            self._drive = self._drive_dummy
+        elif USE_LGPIO:
+            self._drive = self._drive_lgpio
+        elif USE_GPIOZERO:
+            self._drive = self._drive_gpiozero
+        else:
+            self._drive = self._drive_rpigpio
+            self._stop_bits = DIR_COAST  # RPi.GPIO has always let the motors coast on stop
         
         self.current_speed = 0
         self.current_direction = "stop"
+        self._duties = None  # (duty_a, duty_b) last written to ENA/ENB, None = unknown
+        
+        # Latest-wins command slot drained by a writer thread at a fixed rate, so
+        # bursts of commands from the network never turn into bursts of pin writes
+        self._writer = None
+        self._pending = None
+        self._pending_ready = threading.Condition()
+        if command_hz:
+            self._command_period = 1.0 / command_hz
+            self._writer_cpus = writer_cpus
+            self._writer_priority = writer_priority
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
     
-    def forward(self, speed=50):
+    def forward(self, speed=50, force=False):
         """Move forward at given speed (0-100)"""
-        if self.dummy_mode:
-            print(f"DUMMY: Forward at {speed}%")
-            self.current_direction = "forward"
-            self.current_speed = speed
-            return
-        
-        speed_fraction = speed / 100.0  # Convert 0-100 to 0.0-1.0
-        
-        if USE_GPIOZERO:
-            # Motor A forward
-            self.in1_a.on()
-            self.in2_a.off()
-            self.ena_a.value = speed_fraction
-            
-            # Motor B forward
-            self.in1_b.on()
-            self.in2_b.off()
-            self.ena_b.value = speed_fraction
-        elif USE_RPIGPIO:
-            GPIO.output(self.in1, GPIO.HIGH)
-            GPIO.output(self.in2, GPIO.LOW)
-            GPIO.output(self.in3, GPIO.HIGH)
-            GPIO.output(self.in4, GPIO.LOW)
-            self.pwm_a.ChangeDutyCycle(speed)
-            self.pwm_b.ChangeDutyCycle(speed)
-        
-        self.current_direction = "forward"
-        self.current_speed = speed
+        self._command("forward", speed, DIR_FORWARD, speed, speed, force)
     
-    def backward(self, speed=50):
+    def backward(self, speed=50, force=False):
         """Move backward at given speed (0-100)"""
-        if self.dummy_mode:
-            print(f"DUMMY: Backward at {speed}%")
-            self.current_direction = "backward"
-            self.current_speed = speed
-            return
-        
-        speed_fraction = speed / 100.0
-        
-        if USE_GPIOZERO:
-            # Motor A backward
-            self.in1_a.off()
-            self.in2_a.on()
-            self.ena_a.value = speed_fraction
-            
-            # Motor B backward
-            self.in1_b.off()
-            self.in2_b.on()
-            self.ena_b.value = speed_fraction
-        elif USE_RPIGPIO:
-            GPIO.output(self.in1, GPIO.LOW)
-            GPIO.output(self.in2, GPIO.HIGH)
-            GPIO.output(self.in3, GPIO.LOW)
-            GPIO.output(self.in4, GPIO.HIGH)
-            self.pwm_a.ChangeDutyCycle(speed)
-            self.pwm_b.ChangeDutyCycle(speed)
-        
-        self.current_direction = "backward"
-        self.current_speed = speed
+        self._command("backward", speed, DIR_BACKWARD, speed, speed, force)
     
-    def left(self, speed=50):
+    def left(self, speed=50, force=False):
         """Turn left (left motor slower/stopped)"""
-        if self.dummy_mode:
-            print(f"DUMMY: Left at {speed}%")
-            self.current_direction = "left"
-            self.current_speed = speed
-            return
-        
-        speed_fraction = speed / 100.0
-        
-        if USE_GPIOZERO:
-            # Left motor backward/slow
-            self.in1_a.off()
-            self.in2_a.on()
-            self.ena_a.value = speed_fraction * 0.5  # Half speed
-            
-            # Right motor forward
-            self.in1_b.on()
-            self.in2_b.off()
-            self.ena_b.value = speed_fraction
-        elif USE_RPIGPIO:
-            # Right motor forward, left motor slower/backward
-            GPIO.output(self.in1, GPIO.LOW)
-            GPIO.output(self.in2, GPIO.HIGH)
-            GPIO.output(self.in3, GPIO.HIGH)
-            GPIO.output(self.in4, GPIO.LOW)
-            self.pwm_a.ChangeDutyCycle(speed // 2)
-            self.pwm_b.ChangeDutyCycle(speed)
-        
-        self.current_direction = "left"
-        self.current_speed = speed
+        # Left motor backward at half speed, right motor forward
+        self._command("left", speed, DIR_LEFT, speed * 0.5, speed, force)
     
-    def right(self, speed=50):
+    def right(self, speed=50, force=False):
         """Turn right (right motor slower/stopped)"""
-        if self.dummy_mode:
-            print(f"DUMMY: Right at {speed}%")
-            self.current_direction = "right"
-            self.current_speed = speed
-            return
-        
-        speed_fraction = speed / 100.0
-        
-        if USE_GPIOZERO:
-            # Left motor forward
-            self.in1_a.on()
-            self.in2_a.off()
-            self.ena_a.value = speed_fraction
-            
-            # Right motor backward/slow
-            self.in1_b.off()
-            self.in2_b.on()
-            self.ena_b.value = speed_fraction * 0.5  # Half speed
-        elif USE_RPIGPIO:
-            # Left motor forward, right motor slower/backward
-            GPIO.output(self.in1, GPIO.HIGH)
-            GPIO.output(self.in2, GPIO.LOW)
-            GPIO.output(self.in3, GPIO.LOW)
-            GPIO.output(self.in4, GPIO.HIGH)
-            self.pwm_a.ChangeDutyCycle(speed)
-            self.pwm_b.ChangeDutyCycle(speed // 2)
-        
-        self.current_direction = "right"
-        self.current_speed = speed
+        # Left motor forward, right motor backward at half speed
+        self._command("right", speed, DIR_RIGHT, speed, speed * 0.5, force)
     
-    def stop(self):
+    def stop(self, force=False):
         """Stop all motors"""
-        if self.dummy_mode:
-            print("DUMMY: Stop")
-            self.current_direction = "stop"
-            self.current_speed = 0
+        self._command("stop", 0, self._stop_bits, 0, 0, force)
+    
+    def _command(self, direction, speed, direction_bits, duty_a, duty_b, force):
+        """
+        Drive the motors unless they're already doing exactly this
+        Joystick/tracking loops repeat the same command many times a second
+        
+        Args:
+            direction, speed: New current_direction/current_speed
+            direction_bits, duty_a, duty_b: Passed to _drive()
+            force: Write the pins even if nothing changed (hardware state drifted)
+        """
+        if not force and direction == self.current_direction and speed == self.current_speed:
+            return
+        if force:
+            self._duties = None  # Rewrite the PWM duties too
+        self.current_direction = direction
+        self.current_speed = speed
+        if self._writer is None:
+            self._drive(direction_bits, duty_a, duty_b)
             return
+        with self._pending_ready:
+            self._pending = (direction_bits, duty_a, duty_b)  # Replaces anything not yet applied
+            self._pending_ready.notify()
+    
+    def _writer_loop(self):
+        """Apply the newest pending command, then wait out the command period"""
+        self._make_realtime()
+        while True:
+            with self._pending_ready:
+                while self._pending is None:
+                    self._pending_ready.wait()
+                command, self._pending = self._pending, None
+            if command is False:
+                return  # cleanup()
+            self._drive(*command)
+            time.sleep(self._command_period)
+    
+    def _make_realtime(self):
+        """
+        Writer thread only: move to its own CPUs and SCHED_FIFO, so a pin write
+        is never queued behind inference threads. Best effort - warns and carries on
+        """
+        eventlet = sys.modules.get('eventlet')
+        if eventlet is not None and eventlet.patcher.is_monkey_patched('thread'):
+            return  # Green thread = the main OS thread, leave its scheduling alone
         
-        if USE_GPIOZERO:
-            # Brake (both high for active braking)
-            self.in1_a.on()
-            self.in2_a.on()
-            self.ena_a.value = 0.0
-            
-            self.in1_b.on()
-            self.in2_b.on()
-            self.ena_b.value = 0.0
-        elif USE_RPIGPIO:
-            GPIO.output([self.in1, self.in2, self.in3, self.in4], GPIO.LOW)
-            self.pwm_a.ChangeDutyCycle(0)
-            self.pwm_b.ChangeDutyCycle(0)
+        pin_current_thread(self._writer_cpus, "motor writer")
         
-        self.current_direction = "stop"
-        self.current_speed = 0
+        if self._writer_priority and hasattr(os, 'sched_setscheduler'):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self._writer_priority))
+            except OSError as e:
+                print(f"⚠️  Motor writer SCHED_FIFO unavailable ({e}) - "
+                      "allow it with 'rtprio 99' in /etc/security/limits.conf")
+    
+    def _stop_writer(self):
+        """Shut the writer thread down; later commands write the pins directly"""
+        if self._writer is None:
+            return
+        with self._pending_ready:
+            self._pending = False
+            self._pending_ready.notify()
+        self._writer.join(timeout=1)
+        self._writer = None
+    
+    # One _drive_* per backend; __init__ binds the right one to self._drive
+    # Args for all of them:
+    #     direction_bits: DIR_* bits for (IN1, IN2, IN3, IN4), IN1 = bit 0
+    #     duty_a, duty_b: Motor A/B duty cycle (0-100)
+    # PWM duties are only written when they differ from the last ones written
+    # (e.g. forward -> backward at the same speed only flips the direction pins)
+    
+    def _drive_lgpio(self, direction_bits, duty_a, duty_b):
+        """lgpio: set all four direction pins in one group write, then both PWM duties"""
+        lgpio.group_write(self.chip, self.in1, direction_bits)
+        if (duty_a, duty_b) == self._duties:
+            return
+        self._duties = (duty_a, duty_b)
+        if self.hw_pwm:
+            self.hw_pwm[0].change_duty_cycle(duty_a)
+            self.hw_pwm[1].change_duty_cycle(duty_b)
+        else:
+            lgpio.tx_pwm(self.chip, self.ena, PWM_FREQUENCY, duty_a)
+            lgpio.tx_pwm(self.chip, self.enb, PWM_FREQUENCY, duty_b)
+    
+    def _drive_gpiozero(self, direction_bits, duty_a, duty_b):
+        """gpiozero: one device per pin"""
+        self.in1_a.value = direction_bits & 1
+        self.in2_a.value = (direction_bits >> 1) & 1
+        self.in1_b.value = (direction_bits >> 2) & 1
+        self.in2_b.value = (direction_bits >> 3) & 1
+        if (duty_a, duty_b) == self._duties:
+            return
+        self._duties = (duty_a, duty_b)
+        if self.hw_pwm:
+            self.hw_pwm[0].change_duty_cycle(duty_a)
+            self.hw_pwm[1].change_duty_cycle(duty_b)
+        else:
+            self.ena_a.value = duty_a / 100.0  # gpiozero takes 0.0-1.0
+            self.ena_b.value = duty_b / 100.0
+    
+    def _drive_rpigpio(self, direction_bits, duty_a, duty_b):
+        """RPi.GPIO: all four direction pins in one call, then both software PWM duties"""
+        self._gpio_output(self._pins, self._levels[direction_bits])
+        if (duty_a, duty_b) == self._duties:
+            return
+        self._duties = (duty_a, duty_b)
+        if self.hw_pwm:
+            self.hw_pwm[0].change_duty_cycle(duty_a)
+            self.hw_pwm[1].change_duty_cycle(duty_b)
+        else:
+            self.pwm_a.ChangeDutyCycle(duty_a)
+            self.pwm_b.ChangeDutyCycle(duty_b)
+    
+    def _drive_dummy(self, direction_bits, duty_a, duty_b):
+        """No GPIO: just report what would have happened"""
+        if direction_bits in (DIR_BRAKE, DIR_COAST):
+            log.debug("DUMMY: Stop")
+        else:
+            log.debug("DUMMY: %s at %s%%", DIRECTION_NAMES[direction_bits], max(duty_a, duty_b))
     
     def get_status(self):
         """Get current motor status"""
@@ -244,26 +353,56 @@ class MotorController:
     
     def cleanup(self):
         """Clean up GPIO"""
-        self.stop()
-        if USE_GPIOZERO and not self.dummy_mode:
+        self._stop_writer()
+        self.stop(force=True)
+        if USE_LGPIO and not self.dummy_mode:
+            try:
+                lgpio.group_free(self.chip, self.in1)
+                if not self.hw_pwm:
+                    lgpio.gpio_free(self.chip, self.ena)
+                    lgpio.gpio_free(self.chip, self.enb)
+                lgpio.gpiochip_close(self.chip)
+            except Exception as e:
+                print(f"Cleanup warning: {e}")
+        elif USE_GPIOZERO and not self.dummy_mode:
             try:
-                self.ena_a.close()
                 self.in1_a.close()
                 self.in2_a.close()
-                self.ena_b.close()
                 self.in1_b.close()
                 self.in2_b.close()
+                if not self.hw_pwm:
+                    self.ena_a.close()
+                    self.ena_b.close()
             except Exception as e:
                 print(f"Cleanup warning: {e}")
         elif USE_RPIGPIO:
-            self.pwm_a.stop()
-            self.pwm_b.stop()
+            if not self.hw_pwm:
+                self.pwm_a.stop()
+                self.pwm_b.stop()
             GPIO.cleanup()
+        if self.hw_pwm:
+            for pwm in self.hw_pwm:
+                pwm.stop()
         print("Motors cleanup complete")
 
 
 # Test code
 if __name__ == "__main__":
+    import signal
+    import threading
+    
+    # Ctrl+C sets the event, so a running step ends within one wait instead
+    # of finishing its sleep first
+    STOP = threading.Event()
+    signal.signal(signal.SIGINT, lambda *args: STOP.set())
+    
+    def run_for(seconds):
+        """Keep the current motion for a while, abort early on Ctrl+C"""
+        if STOP.wait(seconds):
+            raise KeyboardInterrupt
+    
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")  # Show dummy-mode commands
+    
     print("Testing Motor Controller")
     print("Press Ctrl+C to exit\n")
     
@@ -272,19 +411,19 @@ if __name__ == "__main__":
     try:
         print("Forward...")
         motors.forward(60)
-        time.sleep(2)
+        run_for(2)
         
         print("Left...")
         motors.left(60)
-        time.sleep(1)
+        run_for(1)
         
         print("Right...")
         motors.right(60)
-        time.sleep(1)
+        run_for(1)
         
         print("Backward...")
         motors.backward(60)
-        time.sleep(2)
+        run_for(2)
         
         print("Stop")
         motors.stop()
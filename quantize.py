@@ -0,0 +1,92 @@
+"""
+INT8 Post-Training Quantization (NNCF)
+Quantizes the exported OpenVINO YOLO model using frames captured from the robot camera
+Run once on the Pi: python3 quantize.py [num_frames]
+"""
+import os
+import sys
+import glob
+import shutil
+import config
+from detector import HumanDetector, export_openvino_model, Letterbox
+
+
+def preprocess(frame):
+    """Letterbox a calibration frame into the model input tensor"""
+    height, width = frame.shape[:2]
+    return Letterbox((width, height), config.IMGSZ)(frame).copy()
+
+
+def capture_calibration_frames(num_frames):
+    """Grab calibration frames from the robot camera"""
+    detector = HumanDetector(
+        model_name=config.YOLO_MODEL,
+        camera_index=config.CAMERA_INDEX,
+        resolution=(config.CAMERA_WIDTH, config.CAMERA_HEIGHT)
+    )
+
+    frames = []
+    try:
+        print(f"Capturing {num_frames} calibration frames (move around in front of the camera)...")
+        while len(frames) < num_frames:
+            success, frame = detector.read_frame()
+            if not success:
+                print("Failed to read frame")
+                break
+            frames.append(frame.copy())
+            if len(frames) % 50 == 0:
+                print(f"  {len(frames)}/{num_frames}")
+    finally:
+        detector.release()
+
+    return frames
+
+
+def quantize(num_frames=300):
+    """
+    Quantize the FP16 OpenVINO IR to INT8 and save it next to the FP16 model
+
+    Returns:
+        str: Path to the INT8 model directory
+    """
+    import nncf
+    import openvino as ov
+
+    fp16_path = export_openvino_model(config.YOLO_MODEL, int8=False)
+    int8_path = os.path.splitext(config.YOLO_MODEL)[0] + '_int8_openvino_model'
+
+    xml_files = glob.glob(os.path.join(fp16_path, '*.xml'))
+    if not xml_files:
+        raise RuntimeError(f"No OpenVINO .xml model found in {fp16_path}")
+
+    frames = capture_calibration_frames(num_frames)
+    if not frames:
+        raise RuntimeError("No calibration frames captured - check the camera")
+
+    core = ov.Core()
+    model = core.read_model(xml_files[0])
+    calibration_dataset = nncf.Dataset(frames, preprocess)
+
+    print(f"Quantizing with {len(frames)} frames (this can take a few minutes)...")
+    quantized_model = nncf.quantize(
+        model,
+        calibration_dataset,
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(frames)
+    )
+
+    # Save INT8 IR with the same layout Ultralytics expects
+    os.makedirs(int8_path, exist_ok=True)
+    ov.save_model(quantized_model, os.path.join(int8_path, os.path.basename(xml_files[0])))
+    metadata = os.path.join(fp16_path, 'metadata.yaml')
+    if os.path.exists(metadata):
+        shutil.copy(metadata, int8_path)
+
+    print(f"✓ INT8 model saved: {int8_path}")
+    print("  Set YOLO_INT8 = True in config.py to use it")
+    return int8_path
+
+
+if __name__ == "__main__":
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    quantize(num_frames)
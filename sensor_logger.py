@@ -2,23 +2,98 @@
 Sensor Data Logger
 Logs temperature and sensor data with timestamps for Excel export
 """
+import os
 import time
 from datetime import datetime
-from collections import deque
-import threading
+import numpy as np
+
+# Logged columns, in CSV order (SensorData attribute, CSV value format)
+LOG_COLUMNS = (
+    ('temperature', '%.2f'),
+    ('distance', '%.2f'),
+    ('accelX', '%.2f'),
+    ('accelY', '%.2f'),
+    ('accelZ', '%.2f'),
+    ('gyroX', '%.2f'),
+    ('gyroY', '%.2f'),
+    ('gyroZ', '%.2f'),
+    # Air quality data
+    ('mq2', '%.0f'),
+    ('co2', '%.0f'),
+    ('tvoc', '%.0f'),
+)
+CSV_HEADER = ("Timestamp,Temperature (°C),Distance (cm),Accel X (m/s²),Accel Y (m/s²),Accel Z (m/s²),"
+              "Gyro X (°/s),Gyro Y (°/s),Gyro Z (°/s),MQ-2 Gas,CO2 (ppm),TVOC (ppb)")
+
+
+def _format_time(timestamp_ns):
+    """Epoch nanoseconds -> 'YYYY-MM-DD HH:MM:SS.mmm' (local time)"""
+    return datetime.fromtimestamp(timestamp_ns / 1e9).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _format_times(timestamps_ns):
+    """
+    Vectorized _format_time for a whole column (one NumPy pass, no per-row datetime)
+    Each row gets the UTC offset in force at its own time, so rows logged across
+    a DST change match _format_time. Offsets only change on whole minutes, so
+    localtime() runs once per distinct minute instead of once per row
+    
+    Returns:
+        list: 'YYYY-MM-DD HH:MM:SS.mmm' strings (local time)
+    """
+    minutes, row_minute = np.unique(timestamps_ns // 60_000_000_000, return_inverse=True)
+    utc_offsets_ns = np.array([time.localtime(minute * 60).tm_gmtoff for minute in minutes.tolist()],
+                              dtype=np.int64) * 1_000_000_000
+    local = (timestamps_ns + utc_offsets_ns[row_minute]).astype('datetime64[ns]')
+    # ISO 'YYYY-MM-DDTHH:MM:SS.mmm' -> space instead of the 'T'
+    return np.char.replace(np.datetime_as_string(local, unit='ms'), 'T', ' ').tolist()
 
 
 class SensorLogger:
-    def __init__(self, max_entries=1000):
+    def __init__(self, max_entries=1000, path=None):
         """
         Initialize sensor logger
         
         Args:
-            max_entries: Maximum number of entries to keep in memory (default: 1000)
+            max_entries: Maximum number of entries to keep (default: 1000)
+            path: Keep the entries in this memory-mapped file instead of RAM, so long
+                  sessions are bounded by disk and survive an app crash or restart -
+                  an existing log with the same max_entries is reopened and appended
+                  to (default: None)
         """
         self.max_entries = max_entries
-        self.data_log = deque(maxlen=max_entries)
-        self.lock = threading.Lock()
+        # Ring buffer, one row per reading (columns: LOG_COLUMNS) - no per-sample
+        # dicts or strings, timestamps are only formatted on export.
+        # One spare slot: the row being written never holds one of the newest
+        # max_entries, so readers can always return all of them
+        self._slots = slots = max_entries + 1
+        if path:
+            # Fixed-stride records (int64 time_ns + float32 columns) in the page cache;
+            # the kernel writes them back in the background
+            # File = header (_written, _cleared as int64) + the records
+            record = np.dtype([('ts', '<i8'), ('values', '<f4', (len(LOG_COLUMNS),))])
+            header_size = 2 * 8
+            size = header_size + slots * record.itemsize
+            if not (os.path.exists(path) and os.path.getsize(path) == size):
+                with open(path, 'wb') as f:  # New log (or a different max_entries)
+                    f.truncate(size)
+            self._header = np.memmap(path, dtype='<i8', mode='r+', shape=(2,))
+            self._log = np.memmap(path, dtype=record, mode='r+', offset=header_size, shape=(slots,))
+            self._buf = self._log['values']
+            self._ts = self._log['ts']
+        else:
+            self._header = None
+            self._log = None
+            self._buf = np.zeros((slots, len(LOG_COLUMNS)), dtype=np.float32)
+            self._ts = np.zeros(slots, dtype=np.int64)  # time.time_ns()
+        # Single-producer ring (generate_frames logs once per frame, exports read):
+        # the writer publishes a row with one store to _written, so neither side takes a lock
+        self._written = 0  # Rows ever logged; row i lives at i % (max_entries + 1)
+        self._cleared = 0  # _written at the last clear_log()
+        if self._header is not None:
+            self._written, self._cleared = (int(value) for value in self._header)
+        self._fields = tuple(name for name, _ in LOG_COLUMNS)
+        self._row_format = ','.join(['%s'] + [fmt for _, fmt in LOG_COLUMNS])
         self.logging_enabled = True
         
     def log_data(self, arduino_data):
@@ -26,31 +101,37 @@ class SensorLogger:
         Log sensor data with timestamp
         
         Args:
-            arduino_data: Dictionary containing sensor readings
+            arduino_data: SensorData snapshot from ArduinoSerial.get_data()
         """
         if not self.logging_enabled:
             return
-            
-        timestamp = datetime.now()
         
-        with self.lock:
-            entry = {
-                'timestamp': timestamp,
-                'datetime_str': timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],  # Include milliseconds
-                'temperature': arduino_data.get('temperature', 0),
-                'distance': arduino_data.get('distance', 0),
-                'accel_x': arduino_data.get('accelX', 0),
-                'accel_y': arduino_data.get('accelY', 0),
-                'accel_z': arduino_data.get('accelZ', 0),
-                'gyro_x': arduino_data.get('gyroX', 0),
-                'gyro_y': arduino_data.get('gyroY', 0),
-                'gyro_z': arduino_data.get('gyroZ', 0),
-                # Air quality data (NEW)
-                'mq2': arduino_data.get('mq2', 0),
-                'co2': arduino_data.get('co2', -1),
-                'tvoc': arduino_data.get('tvoc', -1),
-            }
-            self.data_log.append(entry)
+        written = self._written
+        row = written % self._slots
+        self._buf[row] = [getattr(arduino_data, name) for name in self._fields]
+        self._ts[row] = time.time_ns()
+        self._written = written + 1  # Publish
+        if self._header is not None:
+            self._header[0] = written + 1  # After the row, so a crash never counts a half-written one
+    
+    def _snapshot(self):
+        """
+        Copy the logged entries out of the ring, oldest first
+        
+        Returns:
+            tuple: (rows (N, columns) float32, timestamps (N,) int64 ns)
+        """
+        written = self._written
+        count = min(written - self._cleared, self.max_entries)
+        first = written - count
+        order = np.arange(first, written) % self._slots
+        rows = self._buf[order]
+        timestamps = self._ts[order]
+        
+        # Rows the writer may have reused while we copied are the oldest ones - drop them
+        # (it can be partway through row _written, which overwrites row _written - max_entries - 1)
+        stale = max(0, self._written - self.max_entries - first)
+        return rows[stale:], timestamps[stale:]
     
     def get_csv_data(self):
         """
@@ -59,34 +140,16 @@ class SensorLogger:
         Returns:
             CSV formatted string with header and data rows
         """
-        with self.lock:
-            if len(self.data_log) == 0:
-                return "No data logged yet"
-            
-            # CSV header
-            csv_lines = [
-                "Timestamp,Temperature (°C),Distance (cm),Accel X (m/s²),Accel Y (m/s²),Accel Z (m/s²),Gyro X (°/s),Gyro Y (°/s),Gyro Z (°/s),MQ-2 Gas,CO2 (ppm),TVOC (ppb)"
-            ]
-            
-            # Data rows
-            for entry in self.data_log:
-                row = (
-                    f"{entry['datetime_str']},"
-                    f"{entry['temperature']:.2f},"
-                    f"{entry['distance']:.2f},"
-                    f"{entry['accel_x']:.2f},"
-                    f"{entry['accel_y']:.2f},"
-                    f"{entry['accel_z']:.2f},"
-                    f"{entry['gyro_x']:.2f},"
-                    f"{entry['gyro_y']:.2f},"
-                    f"{entry['gyro_z']:.2f},"
-                    f"{entry['mq2']},"
-                    f"{entry['co2']:.0f},"
-                    f"{entry['tvoc']:.0f}"
-                )
-                csv_lines.append(row)
-            
-            return '\n'.join(csv_lines)
+        rows, timestamps = self._snapshot()
+        if len(rows) == 0:
+            return "No data logged yet"
+        
+        # Timestamps in one vectorized pass, then a single %-format per row
+        row_format = self._row_format
+        csv_lines = [CSV_HEADER]
+        csv_lines.extend(row_format % (ts, *row)
+                         for ts, row in zip(_format_times(timestamps), rows.tolist()))
+        return '\n'.join(csv_lines)
     
     def get_stats(self):
         """
@@ -95,33 +158,33 @@ class SensorLogger:
         Returns:
             Dictionary with stats (count, time range, etc.)
         """
-        with self.lock:
-            if len(self.data_log) == 0:
-                return {
-                    'count': 0,
-                    'start_time': None,
-                    'end_time': None,
-                    'duration': 0
-                }
-            
-            first_entry = self.data_log[0]
-            last_entry = self.data_log[-1]
-            duration = (last_entry['timestamp'] - first_entry['timestamp']).total_seconds()
-            
+        rows, timestamps = self._snapshot()
+        if len(rows) == 0:
             return {
-                'count': len(self.data_log),
-                'start_time': first_entry['datetime_str'],
-                'end_time': last_entry['datetime_str'],
-                'duration': duration,
-                'temp_avg': sum(e['temperature'] for e in self.data_log) / len(self.data_log),
-                'temp_min': min(e['temperature'] for e in self.data_log),
-                'temp_max': max(e['temperature'] for e in self.data_log),
+                'count': 0,
+                'start_time': None,
+                'end_time': None,
+                'duration': 0
             }
+        
+        first_ns, last_ns = int(timestamps[0]), int(timestamps[-1])
+        temperature = rows[:, 0]
+        
+        return {
+            'count': len(rows),
+            'start_time': _format_time(first_ns),
+            'end_time': _format_time(last_ns),
+            'duration': (last_ns - first_ns) / 1e9,
+            'temp_avg': float(temperature.mean()),
+            'temp_min': float(temperature.min()),
+            'temp_max': float(temperature.max()),
+        }
     
     def clear_log(self):
         """Clear all logged data"""
-        with self.lock:
-            self.data_log.clear()
+        self._cleared = self._written  # Readers only look at rows after this
+        if self._header is not None:
+            self._header[1] = self._cleared
     
     def enable_logging(self):
         """Enable data logging"""
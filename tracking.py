@@ -3,8 +3,53 @@ Auto-Tracking Module
 Implements autonomous person-following behavior with ultrasonic safety stop
 """
 import time
+import atexit
+import queue
+import logging
+import logging.handlers
+import numpy as np
 import config
 
+log = logging.getLogger("tracking")
+
+LOG_INTERVAL_NS = 500_000_000  # Repeated control-loop warnings: at most one per 0.5s
+
+
+def _start_log_listener():
+    """
+    Route tracking log records through a queue to a background thread, so the
+    control loop only enqueues a record and never waits on stdout
+    
+    Returns:
+        QueueListener: The running listener (stopped, and flushed, at exit)
+    """
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    log.addHandler(logging.handlers.QueueHandler(records))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return listener
+
+
+def box_iou(boxes, box):
+    """
+    Intersection-over-union of every box in an (N,4) [x1, y1, x2, y2] array with one box
+    
+    Returns:
+        numpy array: (N,) IoU values (0-1)
+    """
+    inter_w = np.minimum(boxes[:, 2], box[2]) - np.maximum(boxes[:, 0], box[0])
+    inter_h = np.minimum(boxes[:, 3], box[3]) - np.maximum(boxes[:, 1], box[1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    box_area = (box[2] - box[0]) * (box[3] - box[1])
+    return inter / np.maximum(areas + box_area - inter, 1e-6)
+
 
 class PersonTracker:
     def __init__(self, motor_controller, arduino_serial):
@@ -27,6 +72,51 @@ class PersonTracker:
         # Safety settings
         self.EMERGENCY_STOP_DISTANCE = 20  # cm - stop if closer than this
         self.TARGET_RESELECT_FRAMES = 5  # Reselect target every 5 frames
+        self.TARGET_MIN_IOU = 0.3  # In between, follow the box overlapping the target this much
+        self.PERSON_LOST_TIMEOUT = 2.0  # seconds - stop if no person seen for this long
+        # Stale-detection limit: one detection interval at the measured frame rate
+        # (starts at STREAM_FPS_LIMIT) plus the inference allowance
+        self._detect_every = config.PROCESS_EVERY_N_FRAMES
+        self._inference_allowance_ns = int(config.TRACKING_INFERENCE_ALLOWANCE * 1e9)
+        self._frame_period_ns = int(1e9 / config.STREAM_FPS_LIMIT)
+        self._last_call_ns = 0
+        
+        # Steering settings (bound once here instead of rebuilt on every frame)
+        self.CENTER_THRESHOLD = 40  # Person is "centered" if within 40px of center
+        self.TURN_SPEED = 55
+        self.FORWARD_SPEED = 50
+        
+        # (motor command, speed, action name) by where the person is:
+        # left of the centre band, inside it, right of it
+        self._actions = (
+            (motor_controller.left, self.TURN_SPEED, "turn_left"),
+            (motor_controller.forward, self.FORWARD_SPEED, "forward"),
+            (motor_controller.right, self.TURN_SPEED, "turn_right"),
+        )
+        
+        if not log.handlers:
+            _start_log_listener()
+        self._last_warning_ns = 0
+        
+        # Status dicts returned by process_detection, built once and updated in place
+        self._status_disabled = {"status": "disabled"}
+        self._status_stopped = {"status": "stopped", "reason": "no_person_detected"}
+        self._status_searching = {"status": "searching", "reason": "temporary_loss"}
+        self._status_stale = {"status": "skipped_stale", "reason": "frame_too_old"}
+        self._status_emergency = {
+            "status": "EMERGENCY_STOP",
+            "reason": "obstacle_too_close",
+            "distance": 0,
+            "threshold": self.EMERGENCY_STOP_DISTANCE
+        }
+        self._status_tracking = {
+            "status": "tracking",
+            "action": None,
+            "offset": 0,
+            "person_center": 0,
+            "distance": 0,
+            "target_locked": False
+        }
         
         print("✓ Person tracker initialized")
         print(f"  Emergency stop: < {self.EMERGENCY_STOP_DISTANCE}cm")
@@ -35,7 +125,7 @@ class PersonTracker:
     def enable(self):
         """Enable auto-tracking mode"""
         self.enabled = True
-        self.last_detection_time = time.time()
+        self.last_detection_time = time.monotonic()
         print("Auto-tracking: ENABLED")
     
     def disable(self):
@@ -44,68 +134,94 @@ class PersonTracker:
         self.motors.stop()
         print("Auto-tracking: DISABLED")
     
-    def process_detection(self, detections, human_count):
+    def process_detection(self, detections, human_count, arduino_data=None, frame_ts_ns=None):
         """
         Process YOLO detections and control motors with safety checks
         
         Args:
-            detections: List of [x1, y1, x2, y2] bounding boxes
+            detections: (N,4) array of [x1, y1, x2, y2] bounding boxes
             human_count: Number of humans detected
+            arduino_data: SensorData the caller already read this frame (optional,
+                          read from the Arduino if not given)
+            frame_ts_ns: time.monotonic_ns() when the detections' frame was captured
+                         (optional). If they're older than one detection interval plus
+                         the inference allowance, the motors stop instead of steering
+                         from an out-of-date position
             
         Returns:
-            dict: Tracking status
+            dict: Tracking status (reused between calls - read it before the next
+                  call and don't modify it)
         """
         if not self.enabled:
-            return {"status": "disabled"}
+            return self._status_disabled
         
         self.frame_count += 1
         
+        # Track the real frame period (EWMA, 1/8 weight) - ignores gaps while disabled
+        now_ns = time.monotonic_ns()
+        dt_ns = now_ns - self._last_call_ns
+        self._last_call_ns = now_ns
+        if dt_ns < 1_000_000_000:
+            self._frame_period_ns = (self._frame_period_ns * 7 + dt_ns) >> 3
+        
         # Get distance from ultrasonic sensor
-        arduino_data = self.arduino.get_data()
-        distance = arduino_data.get('distance', 999)
+        if arduino_data is None:
+            arduino_data = self.arduino.get_data()
+        distance = arduino_data.distance
         
         # EMERGENCY STOP: Ultrasonic < 20cm
         if distance < self.EMERGENCY_STOP_DISTANCE and distance > 0:
             self.motors.stop()
-            print(f"⚠️  EMERGENCY STOP: Obstacle at {distance:.1f}cm (< {self.EMERGENCY_STOP_DISTANCE}cm)")
-            return {
-                "status": "EMERGENCY_STOP",
-                "reason": "obstacle_too_close",
-                "distance": distance,
-                "threshold": self.EMERGENCY_STOP_DISTANCE
-            }
+            now_ns = time.monotonic_ns()
+            if now_ns - self._last_warning_ns > LOG_INTERVAL_NS:
+                self._last_warning_ns = now_ns
+                log.warning("⚠️  EMERGENCY STOP: Obstacle at %.1fcm (< %scm)",
+                            distance, self.EMERGENCY_STOP_DISTANCE)
+            status = self._status_emergency
+            status["distance"] = distance
+            return status
+        
+        # Stale detections (inference fell behind) - hold still rather than keep
+        # running the last command, or steer from where the person was
+        max_age_ns = self._detect_every * self._frame_period_ns + self._inference_allowance_ns
+        if frame_ts_ns and now_ns - frame_ts_ns > max_age_ns:
+            self.motors.stop()
+            return self._status_stale
         
         # No person detected
         if human_count == 0 or len(detections) == 0:
             # Person lost - stop after timeout
-            if time.time() - self.last_detection_time > 2.0:  # 2 second timeout
+            if time.monotonic() - self.last_detection_time > self.PERSON_LOST_TIMEOUT:
                 self.motors.stop()
                 self.target_locked = False
-                return {
-                    "status": "stopped",
-                    "reason": "no_person_detected"
-                }
+                return self._status_stopped
             else:
                 # Keep searching
-                return {
-                    "status": "searching",
-                    "reason": "temporary_loss"
-                }
+                return self._status_searching
         
         # Person detected - update time
-        self.last_detection_time = time.time()
+        self.last_detection_time = time.monotonic()
+        
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 4)
         
-        # Reselect target every N frames (or if no target locked)
-        if not self.target_locked or self.frame_count % self.TARGET_RESELECT_FRAMES == 0:
+        largest_detection = None
+        if self.target_locked and self.last_target is not None \
+                and self.frame_count % self.TARGET_RESELECT_FRAMES != 0:
+            # Follow the locked target: this frame's box that best overlaps where it was
+            ious = box_iou(detections, self.last_target)
+            best = ious.argmax()
+            if ious[best] >= self.TARGET_MIN_IOU:
+                largest_detection = detections[best]
+        
+        # Reselect every N frames, or when the locked target can't be matched
+        if largest_detection is None:
             # Find person with LARGEST bounding box (closest/most prominent)
-            largest_detection = max(detections, key=lambda d: (d[2] - d[0]) * (d[3] - d[1]))
-            self.last_target = largest_detection
+            areas = (detections[:, 2] - detections[:, 0]) * (detections[:, 3] - detections[:, 1])
+            largest_detection = detections[areas.argmax()]
             self.target_locked = True
-        else:
-            # Use previously locked target
-            largest_detection = self.last_target if self.last_target else detections[0]
+        self.last_target = largest_detection.copy()  # detections may be the detector's own buffer
         
-        x1, y1, x2, y2 = largest_detection[:4]
+        x1, y1, x2, y2 = largest_detection[:4].tolist()
         
         # Calculate center of person's bounding box
         person_center_x = (x1 + x2) / 2
@@ -117,14 +233,13 @@ class PersonTracker:
         # Determine action and control motors
         action = self._calculate_action(offset, person_width, distance)
         
-        return {
-            "status": "tracking",
-            "action": action,
-            "offset": offset,
-            "person_center": person_center_x,
-            "distance": distance,
-            "target_locked": self.target_locked
-        }
+        status = self._status_tracking
+        status["action"] = action
+        status["offset"] = offset
+        status["person_center"] = person_center_x
+        status["distance"] = distance
+        status["target_locked"] = self.target_locked
+        return status
     
     def _calculate_action(self, offset, person_width, distance):
         """
@@ -139,30 +254,19 @@ class PersonTracker:
         Returns:
             str: Action description
         """
-        # Define center tolerance (pixels)
-        CENTER_THRESHOLD = 40  # Person is "centered" if within 40px of center
-        
-        # Priority 1: Center on person
-        if abs(offset) > CENTER_THRESHOLD:
-            if offset < 0:
-                # Person on LEFT side - turn left
-                self.motors.left(55)
-                return "turn_left"
-            else:
-                # Person on RIGHT side - turn right
-                self.motors.right(55)
-                return "turn_right"
-        
+        # Priority 1: Center on person (turn towards whichever side they're on)
         # Priority 2: Person centered - move forward towards them
         # (Safety stop handled above if distance < 20cm)
-        self.motors.forward(50)
-        return "forward"
+        threshold = self.CENTER_THRESHOLD
+        command, speed, action = self._actions[(offset > threshold) - (offset < -threshold) + 1]
+        command(speed)
+        return action
     
     def get_status(self):
         """Get current tracking status"""
         return {
             "enabled": self.enabled,
-            "last_detection": time.time() - self.last_detection_time if self.last_detection_time > 0 else None
+            "last_detection": time.monotonic() - self.last_detection_time if self.last_detection_time > 0 else None
         }
 
 
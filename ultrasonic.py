@@ -1,18 +1,21 @@
 """
 HC-SR04 Ultrasonic Sensor Module
 Measures distance using GPIO pins with proper timing
-Compatible with Raspberry Pi 5 using gpiod
+Compatible with Raspberry Pi 5 using gpiod (v2 API, kernel edge events)
 """
 import time
 import threading
 import os
+import itertools
+import logging
+from cpu_affinity import pin_current_thread
 
 USE_GPIOD = False
 USE_RPIGPIO = False
 
 try:
     import gpiod
-    from gpiod.line import Direction, Value
+    from gpiod.line import Direction, Edge, Value
     USE_GPIOD = True
     print("Using gpiod library")
 except ImportError:
@@ -22,6 +25,17 @@ except ImportError:
         print("Using RPi.GPIO library")
     except (ImportError, RuntimeError):
         print("Warning: No GPIO library available. Ultrasonic sensor will return dummy data.")
+log = logging.getLogger("ultrasonic")
+
+# Echo timing (HC-SR04): half the round trip at 34300 cm/s, per nanosecond of pulse
+ECHO_TIMEOUT_NS = 100_000_000  # 100ms
+ECHO_POLL_CHECK = 0x3F  # RPi.GPIO polling: check the timeout every 64 pin reads
+CM_PER_ECHO_NS = 34300 / 2 / 1e9
+ERROR_LOG_INTERVAL_NS = 1_000_000_000  # Repeated measurement errors: at most one log line per second
+
+# Dummy mode readings: a 20cm -> 100cm -> 20cm sweep, precomputed once
+DUMMY_DISTANCES = tuple(round(20 + 80 * i / 63, 1) for i in range(64))
+DUMMY_DISTANCES += DUMMY_DISTANCES[-2:0:-1]
 
 
 class UltrasonicSensor:
@@ -38,42 +52,43 @@ class UltrasonicSensor:
         self.distance = 0
         self.running = False
         self.dummy_mode = False
+        self._dummy_readings = itertools.cycle(DUMMY_DISTANCES)
+        self._last_error_ns = 0
+        
+        if not log.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log.addHandler(handler)
+            log.propagate = False
         
         if USE_GPIOD:
             # Use gpiod for Raspberry Pi 5
             # Try different chip numbers (Pi 5 uses gpiochip4->gpiochip0, older models use gpiochip0)
-            chip_found = False
+            # TRIG is an output; ECHO reports both edges as kernel-timestamped events, so a
+            # measurement sleeps until each edge instead of spinning on the line value
+            self.request = None
+            line_config = {
+                trig_pin: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE),
+                echo_pin: gpiod.LineSettings(direction=Direction.INPUT, edge_detection=Edge.BOTH),
+            }
             for chip_num in [4, 0, 1, 2, 3]:
                 try:
                     chip_path = f'/dev/gpiochip{chip_num}'
                     print(f"Trying {chip_path}...")
-                    self.chip = gpiod.Chip(chip_path)
-                    chip_found = True
+                    self.request = gpiod.request_lines(chip_path, consumer="ultrasonic",
+                                                       config=line_config)
                     print(f"✓ Using gpiochip{chip_num}")
                     break
-                except (FileNotFoundError, PermissionError, OSError) as e:
+                except (FileNotFoundError, PermissionError, OSError, ValueError) as e:
                     print(f"  Failed: {e}")
                     continue
             
-            if not chip_found:
+            if self.request is None:
                 print("⚠️  Could not access any GPIO chip with gpiod")
                 print("   Falling back to dummy mode")
                 self.dummy_mode = True
-        
-        if USE_GPIOD and hasattr(self, 'chip') and not self.dummy_mode:
-            try:
-                self.trig_line = self.chip.get_line(self.trig_pin)
-                self.echo_line = self.chip.get_line(self.echo_pin)
-                
-                self.trig_line.request(consumer="ultrasonic", type=gpiod.LINE_REQ_DIR_OUT)
-                self.echo_line.request(consumer="ultrasonic", type=gpiod.LINE_REQ_DIR_IN)
-                
-                self.trig_line.set_value(0)
+            else:
                 print(f"Ultrasonic sensor initialized (gpiod) on TRIG={trig_pin}, ECHO={echo_pin}")
-            except Exception as e:
-                print(f"Failed to initialize GPIO lines: {e}")
-                print("Falling back to dummy mode")
-                self.dummy_mode = True
         elif USE_RPIGPIO:
             # Use RPi.GPIO for older Pi models
             GPIO.setmode(GPIO.BCM)
@@ -100,60 +115,47 @@ class UltrasonicSensor:
         """
         # Return dummy data if no GPIO library
         if self.dummy_mode:
-            import random
-            return round(random.uniform(20, 100), 1)
+            return next(self._dummy_readings)
         
         try:
             if USE_GPIOD:
-                # Send 10us pulse to trigger
-                self.trig_line.set_value(1)
-                time.sleep(0.00001)  # 10 microseconds
-                self.trig_line.set_value(0)
-                
-                # Wait for echo to start (with timeout)
-                pulse_start = time.time()
-                timeout = pulse_start + 0.1  # 100ms timeout
-                
-                while self.echo_line.get_value() == 0:
-                    pulse_start = time.time()
-                    if pulse_start > timeout:
-                        return -1
-                
-                # Wait for echo to end (with timeout)
-                pulse_end = time.time()
-                timeout = pulse_end + 0.1
-                
-                while self.echo_line.get_value() == 1:
-                    pulse_end = time.time()
-                    if pulse_end > timeout:
-                        return -1
+                pulse_ns = self._echo_pulse_gpiod()
+                if pulse_ns is None:
+                    return -1
             else:
                 # RPi.GPIO version
                 GPIO.output(self.trig_pin, True)
                 time.sleep(0.00001)
                 GPIO.output(self.trig_pin, False)
                 
-                pulse_start = time.time()
-                timeout = pulse_start + 0.1
+                # The loops only read the pin; the clock is read once per edge and
+                # every ECHO_POLL_CHECK polls for the timeout (integer ns, no float math)
+                gpio_input = GPIO.input
+                echo_pin = self.echo_pin
+                clock = time.monotonic_ns
                 
-                while GPIO.input(self.echo_pin) == 0:
-                    pulse_start = time.time()
-                    if pulse_start > timeout:
+                timeout = clock() + ECHO_TIMEOUT_NS
+                polls = 0
+                while not gpio_input(echo_pin):
+                    polls += 1
+                    if not polls & ECHO_POLL_CHECK and clock() > timeout:
                         return -1
+                pulse_start = clock()
                 
-                pulse_end = time.time()
-                timeout = pulse_end + 0.1
-                
-                while GPIO.input(self.echo_pin) == 1:
-                    pulse_end = time.time()
-                    if pulse_end > timeout:
+                timeout = pulse_start + ECHO_TIMEOUT_NS
+                polls = 0
+                while gpio_input(echo_pin):
+                    polls += 1
+                    if not polls & ECHO_POLL_CHECK and clock() > timeout:
                         return -1
+                pulse_end = clock()
+                
+                pulse_ns = pulse_end - pulse_start
             
             # Calculate distance
-            pulse_duration = pulse_end - pulse_start
             # Speed of sound is 343 m/s or 34300 cm/s
             # Distance = (Time × Speed) / 2 (divided by 2 for round trip)
-            distance = (pulse_duration * 34300) / 2
+            distance = pulse_ns * CM_PER_ECHO_NS
             
             # Valid range for HC-SR04 is 2cm to 400cm
             if 2 <= distance <= 400:
@@ -162,19 +164,69 @@ class UltrasonicSensor:
                 return -1
                 
         except Exception as e:
-            print(f"Error measuring distance: {e}")
+            # The reader loop retries every interval - don't flood the console
+            now_ns = time.monotonic_ns()
+            if now_ns - self._last_error_ns > ERROR_LOG_INTERVAL_NS:
+                self._last_error_ns = now_ns
+                log.warning("Error measuring distance: %s", e)
             return -1
     
-    def start_continuous_reading(self, interval=0.1):
+    def _echo_pulse_gpiod(self, timeout=0.1):
+        """
+        Trigger a ping and time the echo pulse from the kernel's edge timestamps
+        The thread blocks in the kernel between edges (no polling), and the
+        timestamps are taken in the interrupt handler, so Python latency doesn't
+        add to the measurement
+        
+        Returns:
+            int: Echo pulse length in nanoseconds, or None on timeout
+        """
+        request = self.request
+        # Drop edges left over from an earlier, timed-out ping
+        while request.wait_edge_events(0):
+            request.read_edge_events()
+        
+        # Send 10us pulse to trigger
+        request.set_value(self.trig_pin, Value.ACTIVE)
+        time.sleep(0.00001)  # 10 microseconds
+        request.set_value(self.trig_pin, Value.INACTIVE)
+        
+        rise_ns = None
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not request.wait_edge_events(remaining):
+                return None
+            for event in request.read_edge_events():
+                if event.event_type == event.Type.RISING_EDGE:
+                    rise_ns = event.timestamp_ns
+                elif rise_ns is not None:
+                    return event.timestamp_ns - rise_ns
+    
+    def start_continuous_reading(self, interval=0.1, cpus=None, priority=None):
         """
         Start continuous distance reading in background thread
         
         Args:
             interval: Time between measurements in seconds (default: 0.1)
+            cpus: Optional set of CPU numbers to pin the reader thread to, so it
+                  doesn't share a core with the camera/inference threads
+            priority: Optional SCHED_FIFO priority (1-99) for the reader thread, so
+                      it isn't preempted mid-ping. Needs root or an rtprio limit,
+                      e.g. '*  hard  rtprio  99' in /etc/security/limits.conf
         """
         self.running = True
         
         def read_loop():
+            pin_current_thread(cpus, "ultrasonic reader")
+            
+            if priority and hasattr(os, 'sched_setscheduler'):
+                try:
+                    os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))  # 0 = this thread
+                except OSError as e:
+                    print(f"⚠️  Ultrasonic reader SCHED_FIFO unavailable ({e}) - "
+                          "allow it with 'rtprio 99' in /etc/security/limits.conf")
+            
             while self.running:
                 measurement = self.measure_distance()
                 if measurement != -1:
@@ -207,12 +259,7 @@ class UltrasonicSensor:
         if self.dummy_mode:
             print("Dummy mode cleanup complete")
         elif USE_GPIOD:
-            if hasattr(self, 'trig_line'):
-                self.trig_line.release()
-            if hasattr(self, 'echo_line'):
-                self.echo_line.release()
-            if hasattr(self, 'chip'):
-                self.chip.close()
+            self.request.release()
             print("GPIO cleanup complete (gpiod)")
         elif USE_RPIGPIO:
             GPIO.cleanup([self.trig_pin, self.echo_pin])